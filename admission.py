@@ -0,0 +1,86 @@
+# admission.py
+import os
+import asyncio
+import threading
+
+import metrics
+from applog import get_logger
+
+MAX_INFLIGHT = int(os.getenv("MAX_INFLIGHT", "32"))            # updates processed at once on the loop
+MAX_QUEUED = int(os.getenv("MAX_QUEUED", "256"))               # admitted updates waiting for a slot
+PROCESS_TIMEOUT = float(os.getenv("PROCESS_TIMEOUT", "60"))    # give up on one update after (s)
+RETRY_AFTER = int(os.getenv("RETRY_AFTER", "5"))               # hint sent with 503 responses
+
+log = get_logger("admission")
+
+
+class AdmissionController:
+    """
+    Bounded admission for webhook updates.
+
+    `try_admit()` is called on the HTTP thread and refuses work once MAX_INFLIGHT + MAX_QUEUED
+    updates are outstanding, so the route can answer 503 (Telegram redelivers later) instead of
+    piling up threads. Admitted updates run on the event loop through `run()`: at most
+    MAX_INFLIGHT at a time, one at a time per user so conversation steps stay ordered.
+    """
+
+    def __init__(self, max_inflight: int = MAX_INFLIGHT, max_queued: int = MAX_QUEUED,
+                 timeout: float = PROCESS_TIMEOUT):
+        self.max_inflight = max_inflight
+        self.capacity = max_inflight + max_queued
+        self.timeout = timeout
+        self._outstanding = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._sem = None
+        self._lanes = {}
+
+    def try_admit(self) -> bool:
+        with self._lock:
+            if self._outstanding >= self.capacity:
+                metrics.incr("webhook_shed")
+                return False
+            self._outstanding += 1
+        self._publish()
+        return True
+
+    def cancel(self):
+        """Give back a slot taken by try_admit() for an update that will not be run."""
+        self._release()
+
+    def _release(self):
+        with self._lock:
+            self._outstanding -= 1
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("webhook_inflight", self._running)
+        metrics.set_gauge("webhook_queued", max(0, self._outstanding - self._running))
+
+    async def run(self, key, coro):
+        """Run an admitted update's coroutine; always releases its admission slot."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = [asyncio.Lock(), 0]
+        lane[1] += 1
+        try:
+            async with lane[0]:
+                async with self._sem:
+                    self._running += 1
+                    try:
+                        return await asyncio.wait_for(coro, self.timeout)
+                    finally:
+                        self._running -= 1
+        except Exception:
+            log.exception("❌ Update processing failed")
+        finally:
+            lane[1] -= 1
+            if lane[1] == 0:
+                del self._lanes[key]
+            self._release()
+
+    @property
+    def outstanding(self) -> int:
+        return self._outstanding
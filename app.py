@@ -1,91 +1,200 @@
 import os
-import re
+import hmac
 import json
-import requests
 import asyncio
+import contextvars
+import time
+import argparse
+import threading
 from datetime import datetime
-from flask import Flask, request
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from flask import Flask, request, jsonify
+from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import (
     Application,
+    ApplicationHandlerStop,
     CommandHandler,
     MessageHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
     filters,
 )
 
+import metrics
+import resilience
+from applog import get_logger
+from throttle import Throttle
+from leads import Lead, LeadStatus, LeadStore, LEADS_FILE, LEGACY_LEADS_FILE, normalize_email, is_valid_email
+from sheet import post_to_sheet, SheetBatcher, GOOGLE_SHEET_WEBAPP_URL
+from search import SearchIndex, MIN_QUERY
+from sessions import SessionTracker, CONVERSATION_TIMEOUT, CONVERSATION_NUDGE, SWEEP_INTERVAL
+from tenants import Tenant, TenantConfig, TenantRegistry, TENANTS_FILE
+from drip import DripQueue, DripScheduler, DRIP_FILE
+from admission import AdmissionController, RETRY_AFTER
+from archive import LeadArchive, tier, ARCHIVE_DIR, ARCHIVE_AFTER_DAYS
+from menu import MenuRouter
+from ingest import ingest, LEADS_API_KEY, LEADS_MAX_BATCH, LEADS_RATE, LEADS_BURST
+from inline import InlineReply, InlineReplyBot, MutedReply, inline_reply, INLINE_REPLY_WAIT
+from journal import UpdateJournal, iter_records, JOURNAL_ENABLED
+
 # ========== ENV CONFIG ==========
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-GOOGLE_SHEET_WEBAPP_URL = os.getenv("GOOGLE_SHEET_WEBAPP_URL")
 ROOT_URL = os.getenv("ROOT_URL", "https://digitalmarketingbiz-bot.onrender.com")
 PORT = int(os.getenv("PORT", "10000"))
+ADMIN_CHAT_IDS = [int(x) for x in os.getenv("ADMIN_CHAT_ID", "").replace(" ", "").split(",") if x]
+BOT_MODE = os.getenv("BOT_MODE", "webhook")  # "webhook" (Render/gunicorn) or "polling"
+TENANT_REAP_INTERVAL = int(os.getenv("TENANT_REAP_INTERVAL", "60"))
+INLINE_REPLIES = os.getenv("INLINE_REPLIES", "1") == "1"  # answer simple menu taps in the webhook response
 
-# ========== STORAGE ==========
-LEADS_FILE = "leads.json"
-def load_leads():
-    if not os.path.exists(LEADS_FILE):
-        return []
-    try:
-        with open(LEADS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return []
-
-def save_leads(leads):
-    with open(LEADS_FILE, "w", encoding="utf-8") as f:
-        json.dump(leads, f, ensure_ascii=False, indent=2)
-
-# ========== HELPERS ==========
-def normalize_email(raw: str) -> str:
-    if not raw:
-        return ""
-    return raw.replace("\u200c", "").replace("\u200f", "").strip().lower()
-
-EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
-def is_valid_email(email: str) -> bool:
-    return EMAIL_RE.match(email.strip()) if email else False
-
-def post_to_sheet(payload: dict, timeout: int = 10) -> bool:
-    if not GOOGLE_SHEET_WEBAPP_URL:
-        print("⚠️ GOOGLE_SHEET_WEBAPP_URL not set")
-        return False
-    try:
-        r = requests.post(GOOGLE_SHEET_WEBAPP_URL, json=payload, timeout=timeout)
-        print(f"📤 POST Sheet → {r.status_code}: {r.text[:200]}")
-        return r.status_code == 200
-    except Exception as e:
-        print("❌ post_to_sheet error:", e)
-        return False
+log = get_logger("bot")
+
+try:
+    import orjson  # optional, ~2-3x faster than json for webhook payloads
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# ========== RAW UPDATE FILTER ==========
+# Every handler below works on text messages only, so Telegram is asked not to send
+# anything else, and whatever still arrives is dropped before building Update objects.
+ALLOWED_UPDATES = ["message"]
+
+def prefilter_update(data) -> str:
+    """Return why a raw webhook payload can be dropped, or "" if it should be processed."""
+    if not isinstance(data, dict) or not isinstance(data.get("update_id"), int):
+        return "malformed"
+    msg = data.get("message")
+    if msg is None:
+        return "unhandled_type"
+    if not isinstance(msg, dict) or not isinstance(msg.get("chat"), dict) or "date" not in msg:
+        return "malformed"
+    if not isinstance(msg.get("text"), str):
+        return "no_text"
+    return ""
+
+def get_tenant(context: ContextTypes.DEFAULT_TYPE) -> Tenant:
+    return context.bot_data["tenant"]
 
 # ========== MENU ==========
-MAIN_MENU = ReplyKeyboardMarkup(
-    [["🏁 شروع", "📘 درباره ما"], ["📝 ثبت‌نام", "📅 رزرو جلسه"]],
-    resize_keyboard=True,
-)
+# Keyboard rows; labels and aliases match regardless of emoji, case, spaces and ZWNJ.
+MENU = [
+    [
+        {"key": "start", "label": "🏁 شروع", "aliases": ["شروع", "منو", "start", "menu"]},
+        {"key": "about", "label": "📘 درباره ما", "aliases": ["درباره ما", "about", "about us"]},
+    ],
+    [
+        {"key": "register", "label": "📝 ثبت‌نام", "aliases": ["ثبت نام", "register", "sign up"]},
+        {"key": "appointment", "label": "📅 رزرو جلسه", "aliases": ["رزرو جلسه", "رزرو", "appointment", "book"]},
+    ],
+]
+menu_router = MenuRouter(MENU)
+MAIN_MENU = menu_router.keyboard()
 
 # ========== STATES ==========
 ASK_NAME, ASK_EMAIL = range(2)
 
+# ========== ANTI-FLOOD & SESSIONS ==========
+throttle = Throttle()
+sessions = SessionTracker()
+# True while handling an update the webhook route has already charged to `throttle`.
+prethrottled = contextvars.ContextVar("prethrottled", default=False)
+
+async def throttle_updates(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Runs in group -1, before every other handler; raising ApplicationHandlerStop drops the update.
+    user = update.effective_user
+    if user is None:
+        return
+    sessions.touch(user.id, update.effective_chat.id if update.effective_chat else None)
+    if not prethrottled.get() and not throttle.allow(user.id):
+        metrics.incr("throttled_updates")
+        raise ApplicationHandlerStop
+    msg = update.message
+    if msg and msg.text and menu_router.match(msg.text) == "register" and not throttle.allow_registration(user.id):
+        metrics.incr("throttled_registrations")
+        raise ApplicationHandlerStop
+
+# ========== TEXTS (defaults; tenants may override) ==========
+WELCOME_TEXT = (
+    "👋 سلام! به ربات دیجیتال مارکتینگ خوش آمدید.\n\n"
+    "از منوی زیر انتخاب کنید:"
+)
+ABOUT_TEXT = (
+    "📘 *درباره ما:*\n"
+    "ما آموزش و راه‌اندازی بیزنس آنلاین، اتوماسیون و دیژیتال مارکتینگ را "
+    "برای همه ساده کرده‌ایم. با ما یاد بگیرید چطور برند خودتان را بسازید و درآمد آنلاین کسب کنید."
+)
+APPOINTMENT_URL = os.getenv("APPOINTMENT_URL", "https://calendly.com/your-link")
+WELCOME_LINK = os.getenv("WELCOME_LINK", "")
+PDF_PATH = "docs/franchise_intro.pdf"
+
+# ========== DRIP FOLLOW-UPS ==========
+# (kind, days after registration): intro PDF, free training link, booking nudge.
+DRIP_STEPS = [
+    (kind, float(days))
+    for kind, days in zip(("pdf", "training", "booking"), os.getenv("DRIP_DAYS", "0,2,7").split(","))
+]
+
+drip_queue = DripQueue(DRIP_FILE)  # loaded by start_application()
+
+def schedule_drip(tenant: Tenant, chat_id: int, name: str):
+    now = time.time()
+    # One pending job per (tenant, chat, step): a replayed or repeated registration doesn't send twice.
+    drip_queue.schedule(
+        {"id": f"{tenant.config.id}:{chat_id}:{kind}", "due": now + days * 86400, "kind": kind,
+         "tenant": tenant.config.id, "chat_id": chat_id, "name": name}
+        for kind, days in DRIP_STEPS
+    )
+
+async def send_drip_step(job: dict):
+    tenant = await tenants.get_by_id(job["tenant"])
+    if tenant is None:
+        log.warning("⚠️ Drip job for unknown tenant %s dropped", job["tenant"])
+        return
+    bot = tenant.application.bot
+    chat_id = job["chat_id"]
+    if job["kind"] == "pdf":
+        if os.path.exists(PDF_PATH) and os.path.getsize(PDF_PATH) > 0:
+            with open(PDF_PATH, "rb") as f:
+                await bot.send_document(
+                    chat_id,
+                    document=f,
+                    filename="Franchise_Intro.pdf",
+                    caption="📘 فایل معرفی فرانچایز دیجیتال مارکتینگ 👇",
+                )
+    elif job["kind"] == "training":
+        if WELCOME_LINK:
+            await bot.send_message(
+                chat_id,
+                f"🎓 {job.get('name') or ''} آموزش رایگان شما آماده است:\n\n{WELCOME_LINK}",
+            )
+    elif job["kind"] == "booking":
+        await bot.send_message(
+            chat_id,
+            "📅 آماده‌اید قدم بعدی را برداریم؟ یک جلسه مشاوره رایگان رزرو کنید:\n\n"
+            f"{tenant.config.appointment_url or APPOINTMENT_URL}",
+            reply_markup=MAIN_MENU,
+        )
+    log.info("📬 Drip %s sent", job["kind"], extra={"chat_id": chat_id, "tenant": job["tenant"]})
+
+drip_scheduler = DripScheduler(drip_queue, send_drip_step)
+
 # ========== TELEGRAM HANDLERS ==========
 async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "👋 سلام! به ربات دیجیتال مارکتینگ خوش آمدید.\n\n"
-        "از منوی زیر انتخاب کنید:",
+        get_tenant(context).config.welcome_text or WELCOME_TEXT,
         reply_markup=MAIN_MENU,
     )
 
 async def about(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
-        "📘 *درباره ما:*\n"
-        "ما آموزش و راه‌اندازی بیزنس آنلاین، اتوماسیون و دیژیتال مارکتینگ را "
-        "برای همه ساده کرده‌ایم. با ما یاد بگیرید چطور برند خودتان را بسازید و درآمد آنلاین کسب کنید.",
+        get_tenant(context).config.about_text or ABOUT_TEXT,
         parse_mode="Markdown",
         reply_markup=MAIN_MENU,
     )
 
 # === Registration ===
 async def start_registration(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    sessions.conversation_started(update.effective_user.id)
     await update.message.reply_text("📝 لطفاً نام کامل خود را وارد کنید:", reply_markup=ReplyKeyboardRemove())
     return ASK_NAME
 
@@ -102,21 +211,23 @@ async def ask_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ ایمیل معتبر نیست. دوباره وارد کنید:")
         return ASK_EMAIL
 
-    lead = {
-        "name": name,
-        "email": email,
-        "user_id": update.effective_user.id if update.effective_user else None,
-        "username": update.effective_user.username if update.effective_user else None,
-        "status": "Validated",
-        "created_at": datetime.utcnow().isoformat() + "Z",
-    }
-
-    leads = load_leads()
-    leads.append(lead)
-    save_leads(leads)
-
-    posted = post_to_sheet(lead)
+    tenant = get_tenant(context)
+    lead = Lead(
+        name,
+        email,
+        update.effective_user.id if update.effective_user else None,
+        update.effective_user.username if update.effective_user else None,
+        LeadStatus.VALIDATED,
+    )
+    # Known email (a repeat, or a journal replay of this step): the Sheet already has the row.
+    posted = True
+    if tenant.store.add(lead):
+        # Blocking HTTP call: keep it off the event loop shared by every tenant.
+        posted = await asyncio.to_thread(post_to_sheet, lead.to_dict(), url=tenant.config.sheet_url)
     text = f"✅ {name}، ثبت‌نام شما انجام شد!" if posted else "✅ ثبت‌نام انجام شد (ذخیره محلی موفق)."
+    context.user_data.pop("name", None)
+    sessions.conversation_ended(update.effective_user.id)
+    schedule_drip(tenant, update.effective_chat.id, name)
 
     await update.message.reply_text(text, reply_markup=MAIN_MENU)
     return ConversationHandler.END
@@ -125,72 +236,433 @@ async def ask_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def appointment(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "📅 برای رزرو جلسه لطفاً وارد این لینک شوید:\n\n"
-        "https://calendly.com/your-link\n\n"
+        f"{get_tenant(context).config.appointment_url or APPOINTMENT_URL}\n\n"
         "یا از منوی زیر گزینه دیگری انتخاب کنید.",
         reply_markup=MAIN_MENU,
     )
 
 # === Cancel ===
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    context.user_data.pop("name", None)
+    sessions.conversation_ended(update.effective_user.id)
     await update.message.reply_text("❌ لغو شد.", reply_markup=MAIN_MENU)
     return ConversationHandler.END
 
+# === Timeout ===
+async def conversation_timed_out(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Called by ConversationHandler once a registration has been idle for CONVERSATION_TIMEOUT.
+    context.user_data.pop("name", None)
+    if update.effective_user:
+        sessions.conversation_ended(update.effective_user.id)
+    metrics.incr("conversations_timed_out")
+    if CONVERSATION_NUDGE and update.effective_chat:
+        await context.bot.send_message(
+            update.effective_chat.id,
+            "⏰ ثبت‌نام شما نیمه‌کاره ماند. هر زمان خواستید دوباره «📝 ثبت‌نام» را بزنید.",
+            reply_markup=MAIN_MENU,
+        )
+
+# === Sweeper ===
+async def sweep_sessions(context: ContextTypes.DEFAULT_TYPE):
+    evicted = sessions.sweep(context.application)
+    if evicted:
+        metrics.incr("session_entries_evicted", evicted)
+    metrics.set_gauge("live_conversations", sessions.live_conversations)
+    metrics.set_gauge("user_data_entries", len(context.application.user_data))
+    metrics.set_gauge("chat_data_entries", len(context.application.chat_data))
+    metrics.set_gauge("session_memory_bytes", sessions.memory_bytes(context.application))
+
+# === Admin: /find <query> ===
+async def find_lead(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = " ".join(context.args)
+    if len(query.strip()) < MIN_QUERY:
+        await update.message.reply_text(f"🔎 استفاده: /find <نام، یوزرنیم یا ایمیل> (حداقل {MIN_QUERY} حرف)")
+        return
+    tenant = get_tenant(context)
+    if not tenant.search_index.built:
+        # First lookup after a restart: index the store off the event loop.
+        await asyncio.to_thread(tenant.search_index.build, tenant.store)
+    emails = tenant.search_index.search(query)
+    leads = [lead for lead in map(tenant.store.get, emails) if lead is not None]
+    if not leads and "@" in query:
+        # Exact email of a lead that has already been moved to the cold tier.
+        archived = await asyncio.to_thread(tenant.archive.get, normalize_email(query))
+        leads = [archived] if archived else []
+    if not leads:
+        await update.message.reply_text("🔎 موردی پیدا نشد.")
+        return
+    lines = [
+        f"{i}. {lead.name} — @{lead.username or '-'} — {lead.email} — {lead.status.label}"
+        for i, lead in enumerate(leads, 1)
+    ]
+    await update.message.reply_text("🔎 نتایج:\n\n" + "\n".join(lines))
+
 # === Ping ===
 async def ping(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("✅ Bot is alive and connected.")
 
+# === Cold-tier archiving ===
+async def archive_old_leads(context: ContextTypes.DEFAULT_TYPE):
+    tenant = get_tenant(context)
+    moved = await asyncio.to_thread(tier, tenant.store, tenant.archive, ARCHIVE_AFTER_DAYS)
+    if moved:
+        metrics.incr("leads_archived", moved)
+        log.info("🧊 Archived %s leads", moved, extra={"tenant": tenant.config.id})
+
+# === Tenants reaper ===
+async def reap_tenants(context: ContextTypes.DEFAULT_TYPE):
+    await tenants.reap()
+
 # ========== APP ==========
-application = Application.builder().token(TELEGRAM_TOKEN).build()
-
-conv_handler = ConversationHandler(
-    entry_points=[MessageHandler(filters.Regex("^(📝 ثبت‌نام|ثبت نام)$"), start_registration)],
-    states={
-        ASK_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_name)],
-        ASK_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_email)],
-    },
-    fallbacks=[CommandHandler("cancel", cancel)],
-)
+menu_router.on("start", show_menu)
+menu_router.on("about", about)
+menu_router.on("appointment", appointment)
+
+def build_tenant(config: TenantConfig, request) -> Tenant:
+    """Build one bot's Application with the shared connection pool, plus its lead store."""
+    application = Application.builder().bot(InlineReplyBot(config.token, request=request)).build()
+
+    conv_handler = ConversationHandler(
+        entry_points=[MessageHandler(menu_router.filter({"register"}), start_registration)],
+        states={
+            ASK_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_name)],
+            ASK_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, ask_email)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timed_out)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
+    )
+
+    application.add_handler(TypeHandler(Update, throttle_updates), group=-1)
+    application.add_handler(conv_handler)
+    application.add_handler(CommandHandler("start", show_menu))
+    application.add_handler(CommandHandler("ping", ping))
+    if config.admin_chat_ids:
+        application.add_handler(CommandHandler("find", find_lead, filters=filters.Chat(chat_id=config.admin_chat_ids)))
+    application.add_handler(MessageHandler(menu_router.filter(), menu_router.dispatch))
+    application.job_queue.run_repeating(sweep_sessions, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
+    application.job_queue.run_repeating(archive_old_leads, interval=86400, first=600)
+    if config.id == "default":
+        # The default tenant is pinned, so its job queue also drives the reaper.
+        application.job_queue.run_repeating(reap_tenants, interval=TENANT_REAP_INTERVAL, first=TENANT_REAP_INTERVAL)
+
+    os.makedirs(os.path.dirname(config.leads_file) or ".", exist_ok=True)
+    # Only the env-configured bot owns the pre-tenant leads.json; other tenants start empty.
+    store = LeadStore(config.leads_file).load(legacy_path=LEGACY_LEADS_FILE if config.id == "default" else None)
+    search_index = SearchIndex()
+    store.subscribe(search_index.add)
 
-application.add_handler(conv_handler)
-application.add_handler(CommandHandler("start", show_menu))
-application.add_handler(CommandHandler("ping", ping))
-application.add_handler(MessageHandler(filters.Regex("^(🏁 شروع)$"), show_menu))
-application.add_handler(MessageHandler(filters.Regex("^(📘 درباره ما)$"), about))
-application.add_handler(MessageHandler(filters.Regex("^(📅 رزرو جلسه)$"), appointment))
+    archive = LeadArchive(ARCHIVE_DIR if config.id == "default" else os.path.join(ARCHIVE_DIR, config.id))
+    tenant = Tenant(config, application, store, search_index, archive)
+    application.bot_data["tenant"] = tenant
+    return tenant
+
+tenants = TenantRegistry(build_tenant)
+tenants.register(
+    TenantConfig(
+        "default",
+        TELEGRAM_TOKEN,
+        sheet_url=GOOGLE_SHEET_WEBAPP_URL,
+        admin_chat_ids=ADMIN_CHAT_IDS,
+        leads_file=LEADS_FILE,
+    ),
+    pinned=True,
+)
+tenants.load_file(TENANTS_FILE)
+# Importing this module touches no data file: stores and the drip queue are loaded by
+# start_application() (or on a tenant's first use), so the set-webhook/delete-webhook CLI can run
+# next to the live bot without rewriting files under it.
 
 # ========== FLASK & WEBHOOK ==========
 flask_app = Flask(__name__)
 loop = asyncio.new_event_loop()
 asyncio.set_event_loop(loop)
 
-@flask_app.route(f"/{TELEGRAM_TOKEN}", methods=["POST"])
-def webhook():
+def run_async(coro):
+    # In webhook mode the loop runs forever in its own thread (so the job queue fires
+    # between requests); before that, or in polling mode, we drive it directly.
+    if loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    return loop.run_until_complete(coro)
+
+def start_loop_thread():
+    threading.Thread(target=loop.run_forever, name="bot-loop", daemon=True).start()
+
+async def start_application():
+    # Shared by webhook and polling startup.
+    drip_queue.load()
+    await tenants.get(TELEGRAM_TOKEN)
+    if journal is not None:
+        # Before any new update is accepted: the replay runs against this process's stores and
+        # drip queue, and nothing it re-runs can still be in flight.
+        try:
+            await replay_journal()
+        except Exception:
+            log.exception("❌ Journal replay failed")
+    drip_scheduler.start()
+
+admission = AdmissionController()
+journal = UpdateJournal() if JOURNAL_ENABLED else None
+
+# Single-reply handlers whose message can ride back in the webhook response.
+INLINE_MENU_KEYS = {"start", "about", "appointment"}
+INLINE_COMMANDS = {"/start", "/ping"}
+
+def inline_eligible(msg: dict) -> bool:
+    text = msg["text"]
+    if text.startswith("/"):
+        return text.split()[0].split("@")[0] in INLINE_COMMANDS
+    return menu_router.match(text) in INLINE_MENU_KEYS
+
+async def process_webhook(token: str, data: dict, slot: InlineReply = None):
+    inline_reply.set(slot)
+    prethrottled.set(True)
+    tenant = await tenants.get(token)
+    update = Update.de_json(data, tenant.application.bot)
+    await tenant.application.process_update(update)
+    if journal is not None:
+        journal.done(tenant.config.id, update.update_id)
+    log.info(
+        "✅ Processed update successfully.",
+        extra={"update_id": update.update_id,
+               "user_id": update.effective_user.id if update.effective_user else None},
+    )
+    return update
+
+@flask_app.route("/<token>", methods=["POST"])
+def webhook(token):
+    if token not in tenants:
+        return "not found", 404
+    raw = request.get_data()
     try:
-        data = request.get_json(force=True)
-        update = Update.de_json(data, application.bot)
-        # ✅ Proper async handling (no pending-task warnings)
-        loop.run_until_complete(application.process_update(update))
-        print("✅ Processed update successfully.")
-    except Exception as e:
-        print("❌ Webhook error:", e)
+        data = json_loads(raw)
+    except ValueError:
+        data = None
+    reason = prefilter_update(data)
+    if reason:
+        metrics.incr(f"updates_dropped_{reason}")
+        return "ok"
+    msg = data["message"]
+    sender = msg.get("from")
+    # Flooding users are dropped here, before they cost an admission slot and a journal fsync.
+    if isinstance(sender, dict) and "id" in sender and not throttle.allow(sender["id"]):
+        metrics.incr("throttled_updates")
+        return "ok"
+
+    # Shed load instead of tying up a gunicorn thread: Telegram retries non-2xx responses.
+    if not admission.try_admit():
+        return "busy", 503, {"Retry-After": str(RETRY_AFTER)}
+    # Durable before "ok": a crash after this point is recovered by the journal replay at the next start.
+    if journal is not None:
+        try:
+            journaled = journal.append(tenants.config(token).id, data["update_id"], raw).wait()
+        except Exception:
+            log.exception("❌ Journal append failed", extra={"update_id": data["update_id"]})
+            journaled = False
+        if not journaled:
+            admission.cancel()
+            return "journal unavailable", 503, {"Retry-After": str(RETRY_AFTER)}
+    metrics.incr("updates_accepted")
+    sender = sender or msg.get("chat")
+    lane = (token, sender.get("id") if isinstance(sender, dict) else None)
+    slot = InlineReply() if INLINE_REPLIES and inline_eligible(msg) else None
+    # ✅ Hand the update to the event loop and answer right away; admission bounds the backlog.
+    future = asyncio.run_coroutine_threadsafe(admission.run(lane, process_webhook(token, data, slot)), loop)
+    if slot is not None:
+        # Menu taps: wait briefly so their one reply goes back as the response body (no sendMessage call).
+        reply = slot.wait(future, INLINE_REPLY_WAIT)
+        if reply is not None:
+            return jsonify(reply)
+    return "ok"
+
+@flask_app.route("/healthz", methods=["GET"])
+def healthz():
+    # Health checks never touch the loop, the store or Telegram.
     return "ok"
 
 @flask_app.route("/", methods=["GET"])
 def index():
     return f"✅ Bot running — {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}"
 
+@flask_app.route("/metrics", methods=["GET"])
+def metrics_view():
+    metrics.set_gauge("throttle_buckets", len(throttle))
+    metrics.set_gauge("webhook_outstanding", admission.outstanding)
+    metrics.set_gauge("sheet_queue", sheet_batcher.pending)
+    return jsonify({**metrics.snapshot(), "dependencies": resilience.snapshot()})
+
+# ========== LEAD INGESTION (web forms) ==========
+# Landing pages POST leads into the default tenant's store; the Sheet is fed in the background.
+sheet_batcher = SheetBatcher(url=GOOGLE_SHEET_WEBAPP_URL)
+leads_limiter = Throttle(rate=LEADS_RATE, burst=LEADS_BURST, max_registrations=0)
+
+@flask_app.route("/leads", methods=["POST"])
+def leads_endpoint():
+    if not LEADS_API_KEY:
+        return "not found", 404
+    if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {LEADS_API_KEY}"):
+        return "unauthorized", 401
+    try:
+        data = json_loads(request.get_data())
+    except ValueError:
+        return jsonify({"error": "invalid_json"}), 400
+    records = data if isinstance(data, list) else [data]
+    if not records:
+        return jsonify({"error": "empty"}), 400
+    if len(records) > LEADS_MAX_BATCH:
+        return jsonify({"error": "batch_too_large", "max": LEADS_MAX_BATCH}), 413
+    if not leads_limiter.allow("api", cost=len(records)):
+        metrics.incr("leads_throttled")
+        return jsonify({"error": "rate_limited"}), 429, {"Retry-After": "1"}
+    result = ingest(records, tenants.build(TELEGRAM_TOKEN).store, sheet_batcher)
+    if result is None:
+        return jsonify({"error": "sheet_backlog"}), 503, {"Retry-After": str(RETRY_AFTER)}
+    return jsonify(result), 202
+
 def set_webhook():
     try:
-        loop.run_until_complete(application.initialize())
+        run_async(start_application())
         webhook_url = f"{ROOT_URL.rstrip('/')}/{TELEGRAM_TOKEN}"
-        loop.run_until_complete(application.bot.set_webhook(webhook_url))
-        print(f"✅ Webhook set to {webhook_url}")
-        print("✅ Bot started successfully — ready to receive messages.")
+        run_async(tenants.build(TELEGRAM_TOKEN).application.bot.set_webhook(webhook_url, allowed_updates=ALLOWED_UPDATES))
+        log.info("✅ Webhook set to %s/<token>", ROOT_URL.rstrip("/"))
+        log.info("✅ Bot started successfully — ready to receive messages.")
     except Exception as e:
-        print("⚠️ Webhook setup failed:", e)
+        log.warning("⚠️ Webhook setup failed: %s", e)
 
-set_webhook()
+def set_all_webhooks():
+    # Extra tenants are only registered from the CLI, not on every worker boot.
+    try:
+        run_async(tenants.set_webhooks(ROOT_URL, allowed_updates=ALLOWED_UPDATES))
+    except Exception as e:
+        log.warning("⚠️ Webhook setup failed: %s", e)
+
+def delete_webhook():
+    try:
+        run_async(tenants.delete_webhooks())
+    except Exception as e:
+        log.warning("⚠️ Webhook delete failed: %s", e)
+
+# ========== JOURNAL REPLAY ==========
+def replay_plan(records) -> list:
+    """
+    [(record, muted)] to re-run after a crash: every unfinished update, in arrival order.
+    Conversation state lives in memory, so a user's first unfinished update is preceded by the
+    already-answered steps of the registration it belongs to, fed muted to rebuild that state.
+    """
+    records = list(records)
+    done = {(r["tenant"], r["id"]) for r in records if r["op"] == "done"}
+    history, started, seen, plan = {}, set(), set(), []
+    for rec in records:
+        ident = (rec["tenant"], rec["id"])
+        if rec["op"] != "u" or ident in seen:
+            continue
+        seen.add(ident)
+        msg = rec["data"].get("message") or {}
+        key = (rec["tenant"], (msg.get("from") or {}).get("id"))
+        text = msg.get("text", "")
+        steps = history.get(key)
+        if steps and CONVERSATION_TIMEOUT and rec["ts"] - steps[-1]["ts"] > CONVERSATION_TIMEOUT:
+            # That registration had already timed out when this update arrived: nothing to rebuild.
+            del history[key]
+        if ident in done:
+            if key in started:
+                continue
+            if menu_router.match(text) == "register":
+                history[key] = [rec]
+            elif key in history:
+                steps = history[key]
+                steps.append(rec)
+                # entry, name, then email attempts: a valid email or a command ends the conversation.
+                if text.startswith("/") or (len(steps) > 2 and is_valid_email(normalize_email(text))):
+                    del history[key]
+            continue
+        if key not in started:
+            started.add(key)
+            plan.extend((r, True) for r in history.pop(key, ()))
+        plan.append((rec, False))
+    return plan
+
+async def replay_journal():
+    if journal is None:
+        log.warning("⚠️ JOURNAL_ENABLED=0: nothing to replay")
+        return
+    replayed = 0
+    for rec, muted in replay_plan(iter_records()):
+        tenant = await tenants.get_by_id(rec["tenant"])
+        if tenant is None:
+            log.warning("⚠️ Journal update %s for unknown tenant %s", rec["id"], rec["tenant"])
+            continue
+        inline_reply.set(MutedReply() if muted else None)
+        try:
+            await tenant.application.process_update(Update.de_json(rec["data"], tenant.application.bot))
+        except Exception:
+            # One bad record must not block every later one, on this start and all the next.
+            log.exception("❌ Journal update %s could not be replayed", rec["id"], extra={"tenant": rec["tenant"]})
+            metrics.incr("journal_replay_errors")
+            if not muted:
+                journal.done(rec["tenant"], rec["id"])
+            continue
+        finally:
+            inline_reply.set(None)
+        if not muted:
+            journal.done(rec["tenant"], rec["id"])
+            replayed += 1
+    journal.sync()
+    log.info("✅ Replayed %s unfinished updates from the journal", replayed)
+
+def run_replay():
+    # Offline only (the bot replays on every start): a live process would not see what this run stores.
+    try:
+        drip_queue.load()
+        loop.run_until_complete(replay_journal())
+    finally:
+        loop.run_until_complete(tenants.close())
+
+async def poll_all_tenants():
+    from polling import run_polling as poll_updates
+
+    # Each poll loop keeps using its tenant's Application, so the idle reaper must not unload any.
+    for token in tenants.tokens():
+        tenants.pin(token)
+    await start_application()
+    loaded = [await tenants.get(token) for token in tenants.tokens()]
+    await asyncio.gather(*(poll_updates(t.application, allowed_updates=ALLOWED_UPDATES) for t in loaded))
+
+def run_polling():
+    try:
+        loop.run_until_complete(poll_all_tenants())
+    except KeyboardInterrupt:
+        log.info("👋 Polling stopped.")
+    finally:
+        loop.run_until_complete(tenants.close())
+
+# gunicorn imports this module: register the webhook unless we run in polling mode.
+if __name__ != "__main__" and BOT_MODE == "webhook":
+    start_loop_thread()
+    set_webhook()
 
 if __name__ == "__main__":
-    print("🚀 Starting Digital Marketing Bot with menu...")
-    flask_app.run(host="0.0.0.0", port=PORT)
+    parser = argparse.ArgumentParser(description="Digital Marketing Bot "
+                                                 "(replay-journal: stop the bot first; it also replays on start)")
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        default=BOT_MODE,
+        choices=["webhook", "polling", "set-webhook", "delete-webhook", "replay-journal"],
+    )
+    args = parser.parse_args()
+
+    if args.mode == "set-webhook":
+        set_all_webhooks()
+    elif args.mode == "delete-webhook":
+        delete_webhook()
+    elif args.mode == "replay-journal":
+        run_replay()
+    elif args.mode == "polling":
+        log.info("🚀 Starting Digital Marketing Bot in polling mode...")
+        run_polling()
+    else:
+        start_loop_thread()
+        set_webhook()
+        log.info("🚀 Starting Digital Marketing Bot with menu...")
+        flask_app.run(host="0.0.0.0", port=PORT)
@@ -0,0 +1,216 @@
+# archive.py
+import os
+import sys
+import mmap
+import zlib
+import time
+import heapq
+import struct
+import hashlib
+import argparse
+import threading
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from leads import LeadStore, LEADS_FILE, encode_leads, decode_leads
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BLOCK_SIZE = int(os.getenv("ARCHIVE_BLOCK_SIZE", "256"))   # leads per compressed block
+
+# Index record: key (email hash or created_at), segment number, block offset, block length.
+_ENTRY = struct.Struct("<qIQI")
+
+
+def email_hash(email: str) -> int:
+    return int.from_bytes(hashlib.blake2b(email.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class _IndexView:
+    """Sorted fixed-width index file, memory-mapped; indexing returns the key for bisect."""
+
+    def __init__(self, path: str):
+        self._file = None
+        self._map = None
+        self._len = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._len = len(self._map) // _ENTRY.size
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        return _ENTRY.unpack_from(self._map, i * _ENTRY.size)[0]
+
+    def entry(self, i) -> tuple:
+        return _ENTRY.unpack_from(self._map, i * _ENTRY.size)
+
+    def entries(self):
+        return (self.entry(i) for i in range(self._len))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+
+
+class LeadArchive:
+    """
+    Cold tier for old leads: append-only segment files of zlib-compressed blocks
+    (ARCHIVE_BLOCK_SIZE leads each, JSONL rows), plus two sorted, memory-mapped
+    indexes mapping email hash and created_at to (segment, offset, length).
+    Lookups and date-range exports decompress only the blocks they touch.
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_email = None
+        self._by_date = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _segment_path(self, segment: int) -> str:
+        return self._path(f"seg-{segment:06d}.dat")
+
+    def _open_indexes(self):
+        if self._by_email is None:
+            self._by_email = _IndexView(self._path("email.idx"))
+            self._by_date = _IndexView(self._path("date.idx"))
+
+    def _close_indexes(self):
+        for view in (self._by_email, self._by_date):
+            if view is not None:
+                view.close()
+        self._by_email = self._by_date = None
+
+    def _next_segment(self) -> int:
+        numbers = [int(n[4:10]) for n in os.listdir(self.directory) if n.startswith("seg-") and n.endswith(".dat")]
+        return max(numbers, default=0) + 1
+
+    def _read_block(self, segment: int, offset: int, length: int) -> list:
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return decode_leads(zlib.decompress(f.read(length)).decode("utf-8"))
+
+    def append(self, leads) -> int:
+        """Write leads to a new segment and merge them into both indexes. Returns the count written."""
+        leads = sorted(leads, key=lambda lead: lead.created_at)
+        if not leads:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            segment = self._next_segment()
+            by_email, by_date = [], []
+            with open(self._segment_path(segment), "wb") as f:
+                for start in range(0, len(leads), ARCHIVE_BLOCK_SIZE):
+                    block = leads[start:start + ARCHIVE_BLOCK_SIZE]
+                    data = zlib.compress(encode_leads(block).encode("utf-8"), 6)
+                    offset = f.tell()
+                    f.write(data)
+                    for lead in block:
+                        by_email.append((email_hash(lead.email), segment, offset, len(data)))
+                        by_date.append((lead.created_at, segment, offset, len(data)))
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Stream-merge the new entries into the existing sorted indexes.
+            self._open_indexes()
+            for name, view, new in (("email.idx", self._by_email, by_email), ("date.idx", self._by_date, by_date)):
+                new.sort()
+                tmp = self._path(name + ".tmp")
+                with open(tmp, "wb") as f:
+                    pack = _ENTRY.pack
+                    for entry in heapq.merge(view.entries(), new):
+                        f.write(pack(*entry))
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._close_indexes()
+            for name in ("email.idx", "date.idx"):
+                os.replace(self._path(name + ".tmp"), self._path(name))
+        return len(leads)
+
+    def get(self, email: str):
+        """Point lookup by email; reads only the blocks whose index entries match the hash."""
+        h = email_hash(email)
+        with self._lock:
+            self._open_indexes()
+            view = self._by_email
+            i = bisect_left(view, h)
+            blocks = []
+            while i < len(view) and view[i] == h:
+                blocks.append(view.entry(i)[1:])
+                i += 1
+        found = None
+        for block in dict.fromkeys(blocks):  # later segments win
+            for lead in self._read_block(*block):
+                if lead.email == email:
+                    found = lead
+        return found
+
+    def export(self, since: int, until: int):
+        """Yield archived leads with since <= created_at < until, in date order."""
+        with self._lock:
+            self._open_indexes()
+            view = self._by_date
+            lo, hi = bisect_left(view, since), bisect_left(view, until)
+            blocks = dict.fromkeys(view.entry(i)[1:] for i in range(lo, hi))
+        for block in blocks:
+            for lead in self._read_block(*block):
+                if since <= lead.created_at < until:
+                    yield lead
+
+    def __len__(self):
+        with self._lock:
+            self._open_indexes()
+            return len(self._by_email)
+
+
+def tier(store: LeadStore, archive: LeadArchive, older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Move leads created more than `older_than_days` ago from the hot store into the archive."""
+    cutoff = int(time.time()) - older_than_days * 86400
+    old = [lead for lead in store if lead.created_at < cutoff]
+    if not old:
+        return 0
+    archive.append(old)  # durable first, then drop from the hot file
+    # Skip leads that re-registered (fresh created_at) while the archive was being written.
+    still_old = [lead.email for lead in old if (store.get(lead.email) or lead).created_at < cutoff]
+    store.remove(still_old)
+    return len(old)
+
+
+def _parse_date(value: str) -> int:
+    return int(datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-tier lead archive")
+    parser.add_argument("--dir", default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_tier = sub.add_parser("tier", help="move old leads out of the hot store (stop the bot first)")
+    p_tier.add_argument("--leads-file", default=LEADS_FILE)
+    p_tier.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    p_get = sub.add_parser("get", help="look up one archived lead by email")
+    p_get.add_argument("email")
+    p_export = sub.add_parser("export", help="export archived leads as JSONL rows")
+    p_export.add_argument("--since", default="1970-01-01")
+    p_export.add_argument("--until", default="2100-01-01")
+    args = parser.parse_args(argv)
+
+    archive = LeadArchive(args.dir)
+    if args.cmd == "tier":
+        moved = tier(LeadStore(args.leads_file).load(), archive, args.days)
+        print(f"✅ Archived {moved} leads older than {args.days} days")
+    elif args.cmd == "get":
+        lead = archive.get(args.email.strip().lower())
+        print(lead.to_dict() if lead else "not found")
+    else:
+        for lead in archive.export(_parse_date(args.since), _parse_date(args.until)):
+            sys.stdout.write(encode_leads([lead]))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@ import smtplib
 from email.message import EmailMessage
 from dotenv import load_dotenv
 
+from resilience import dependency
+
 # Load environment variables
 load_dotenv()
 
 SMTP_EMAIL = os.getenv("SMTP_EMAIL")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP = dependency("smtp", max_timeout=30)
 
 def send_welcome_email(name: str, recipient_email: str) -> bool:
     """
@@ -31,7 +34,7 @@ def send_welcome_email(name: str, recipient_email: str) -> bool:
     )
 
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
+        with SMTP.guard() as timeout, smtplib.SMTP_SSL("smtp.gmail.com", 465, timeout=timeout) as smtp:
             smtp.login(SMTP_EMAIL, SMTP_PASSWORD)
             smtp.send_message(msg)
         print(f"✅ Welcome email sent to {recipient_email}")
@@ -0,0 +1,97 @@
+# benchmarks/bench_leads.py
+# Compare the old dict + json.dump(indent=2) leads with the slotted Lead + JSONL codec.
+#   python benchmarks/bench_leads.py [N]        (default 200000; try 1000000)
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from leads import Lead, LeadStatus, LeadStore, encode_leads  # noqa: E402
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+NAMES = ["علی رضایی", "Sara Ahmadi", "محمد‌حسین کریمی", "John Smith", "نگار"]
+STATUSES = ["Pending", "Validated", "Verified", "Invalid"]
+
+
+def make_dicts(n):
+    rnd = random.Random(1)
+    base = 1_700_000_000
+    return [
+        {
+            "name": rnd.choice(NAMES),
+            "email": f"user{i}@example.com",
+            "user_id": 100_000_000 + i,
+            "username": f"user_{i}",
+            "status": rnd.choice(STATUSES),
+            "created_at": datetime.fromtimestamp(base + i, timezone.utc).isoformat().replace("+00:00", "") + "Z",
+        }
+        for i in range(n)
+    ]
+
+
+def timed(label, fn):
+    t = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return out, elapsed
+
+
+def traced(fn) -> int:
+    """Bytes still allocated by what fn() returns."""
+    tracemalloc.start()
+    obj = fn()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def main():
+    print(f"{N} leads\n")
+    dicts = make_dicts(N)
+    text_old, enc_old = timed("old: json.dumps(indent=2)", lambda: json.dumps(dicts, ensure_ascii=False, indent=2))
+    _, dec_old = timed("old: json.loads -> list of dicts", lambda: json.loads(text_old))
+
+    store = LeadStore(os.devnull)
+    for i, d in enumerate(dicts):
+        store._put(Lead(d["name"], d["email"], d["user_id"], d["username"],
+                        LeadStatus.parse(d["status"]), 1_700_000_000 + i))
+    del dicts
+    text_new, enc_new = timed("new: LeadStore.dumps()", store.dumps)
+    # What the bot appends between restarts: one row per registration, no snapshot.
+    text_log = encode_leads(store)
+    del store
+    fresh = LeadStore(os.devnull)
+    _, dec_new = timed("new: LeadStore.loads()", lambda: fresh.loads(text_new))
+    timed("new: first lookup (builds email index)", lambda: fresh.get("user7@example.com"))
+    assert fresh.get("user7@example.com").user_id == 100_000_007
+    del fresh
+    log = LeadStore(os.devnull)
+    _, dec_log = timed("new: LeadStore.loads() (row log + index)", lambda: log.loads(text_log))
+    assert log.get("user7@example.com").user_id == 100_000_007
+    del log, text_log
+
+    def load_new():
+        s = LeadStore(os.devnull)
+        s.loads(text_new)
+        s.get("user7@example.com")
+        return s
+
+    mem_old = traced(lambda: json.loads(text_old))
+    mem_new = traced(load_new)
+
+    print()
+    print(f"memory:  {mem_old / 1e6:8.1f} MB -> {mem_new / 1e6:8.1f} MB  ({mem_new / mem_old:.2f}x)")
+    print(f"file:    {len(text_old.encode()) / 1e6:8.1f} MB -> {len(text_new.encode()) / 1e6:8.1f} MB")
+    print(f"encode:  {enc_old / enc_new:6.1f}x faster")
+    print(f"decode:  {dec_old / dec_new:6.1f}x faster (snapshot), {dec_old / dec_log:.1f}x (row log, "
+          f"compacted into a snapshot by the next load)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_webhook.py
+# Replay journaled production updates against a running webhook (use a staging bot token:
+# handlers really answer the chats in the journal).
+#   python benchmarks/bench_webhook.py http://localhost:10000 <token> [--journal DIR] [--concurrency N] [--limit N]
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from journal import iter_updates, JOURNAL_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url")
+    parser.add_argument("token")
+    parser.add_argument("--journal", default=JOURNAL_DIR)
+    parser.add_argument("--tenant")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    bodies = [json.dumps(data, ensure_ascii=False).encode("utf-8")
+              for _, data in iter_updates(args.journal, args.tenant)]
+    if args.limit:
+        bodies = bodies[:args.limit]
+    if not bodies:
+        sys.exit(f"no updates in {args.journal}")
+    endpoint = f"{args.url.rstrip('/')}/{args.token}"
+    session = requests.Session()
+
+    def post(body):
+        t = time.perf_counter()
+        r = session.post(endpoint, data=body, headers={"Content-Type": "application/json"}, timeout=30)
+        return r.status_code, time.perf_counter() - t
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(post, bodies))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(lat for _, lat in results)
+    codes = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"{len(bodies)} updates in {elapsed:.2f}s = {len(bodies) / elapsed:.0f} req/s  status={codes}")
+    print(f"latency p50={pct(0.50):.1f}ms p95={pct(0.95):.1f}ms p99={pct(0.99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# drip.py
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+import metrics
+from applog import get_logger
+
+DRIP_FILE = os.getenv("DRIP_FILE", "drip.jsonl")
+DRIP_BATCH_SIZE = int(os.getenv("DRIP_BATCH_SIZE", "100"))
+DRIP_MAX_ATTEMPTS = int(os.getenv("DRIP_MAX_ATTEMPTS", "3"))
+DRIP_RETRY_DELAY = int(os.getenv("DRIP_RETRY_DELAY", "300"))
+
+log = get_logger("drip")
+
+
+class DripQueue:
+    """
+    Persisted min-heap of timed jobs, keyed by due time (epoch seconds).
+
+    The file is a journal: {"op": "add", ...job} when a job is scheduled and {"op": "done", "id": ...}
+    when it is claimed. Claims are fsynced *before* the job runs, so a restart never runs a job
+    twice (at-most-once); the journal is compacted to pending jobs on load.
+    """
+
+    def __init__(self, path: str = DRIP_FILE):
+        self.path = path
+        self._heap = []
+        self._jobs = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = None
+
+    def load(self) -> "DripQueue":
+        jobs = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        # Torn by a crash mid-append (adds aren't fsynced); _rewrite() below drops it.
+                        log.warning("⚠️ Skipping unreadable drip record: %.80r", line)
+                        continue
+                    if rec.pop("op") == "add":
+                        jobs[rec["id"]] = rec
+                    else:
+                        jobs.pop(rec["id"], None)
+        with self._lock:
+            self._jobs = jobs
+            self._heap = [(job["due"], next(self._seq), job_id) for job_id, job in jobs.items()]
+            heapq.heapify(self._heap)
+            self._rewrite()
+        metrics.set_gauge("drip_pending", len(self._jobs))
+        return self
+
+    def _rewrite(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job in self._jobs.values():
+                f.write(json.dumps({"op": "add", **job}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def _append(self, records, sync: bool):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def schedule(self, jobs) -> list:
+        """
+        Add jobs (dicts with at least "due" and "kind"); returns the ids added. A job whose
+        explicit "id" is already pending is skipped, so scheduling the same job twice is harmless.
+        """
+        ids = []
+        with self._lock:
+            records = []
+            for job in jobs:
+                if job.get("id") in self._jobs:
+                    continue
+                job = dict(job, id=job.get("id") or f"{int(time.time() * 1000)}-{next(self._seq)}")
+                job.setdefault("attempt", 1)
+                self._jobs[job["id"]] = job
+                heapq.heappush(self._heap, (job["due"], next(self._seq), job["id"]))
+                records.append({"op": "add", **job})
+                ids.append(job["id"])
+            if records:
+                self._append(records, sync=False)
+        metrics.set_gauge("drip_pending", len(self._jobs))
+        if self._wakeup is not None:
+            self._wakeup()
+        return ids
+
+    def claim_due(self, now: float, limit: int = DRIP_BATCH_SIZE) -> list:
+        """Pop up to `limit` due jobs and durably mark them done before returning them."""
+        with self._lock:
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < limit:
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.pop(job_id, None)
+                if job is not None:
+                    due.append(job)
+            if due:
+                self._append([{"op": "done", "id": job["id"]} for job in due], sync=True)
+        metrics.set_gauge("drip_pending", len(self._jobs))
+        return due
+
+    def next_due(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        return len(self._jobs)
+
+
+class DripScheduler:
+    """Sleeps until the earliest due job, then runs due jobs in batches via `async handler(job)`."""
+
+    def __init__(self, queue: DripQueue, handler, batch_size: int = DRIP_BATCH_SIZE):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self._event = None
+        self._task = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        # schedule() may be called from Flask threads: wake the loop thread-safely.
+        self.queue._wakeup = lambda: loop.call_soon_threadsafe(self._event.set)
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._event.clear()
+            due = self.queue.next_due()
+            delay = None if due is None else max(0.0, due - time.time())
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            jobs = await asyncio.to_thread(self.queue.claim_due, time.time(), self.batch_size)
+            await asyncio.gather(*(self._run_job(job) for job in jobs))
+
+    async def _run_job(self, job):
+        try:
+            await self.handler(job)
+            metrics.incr("drip_sent")
+        except Exception:
+            log.exception("❌ Drip job %s (%s) failed", job["id"], job.get("kind"))
+            metrics.incr("drip_failed")
+            if job.get("attempt", 1) < DRIP_MAX_ATTEMPTS:
+                retry = {k: v for k, v in job.items() if k != "id"}
+                retry.update(due=time.time() + DRIP_RETRY_DELAY, attempt=job.get("attempt", 1) + 1)
+                self.queue.schedule([retry])
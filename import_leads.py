@@ -0,0 +1,181 @@
+# import_leads.py
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from leads import Lead, LeadStatus, LeadStore, LEADS_FILE, to_timestamp
+from ingest import validate_record
+from sheet import post_batch_to_sheet, SHEET_BATCH_SIZE
+
+IMPORT_CHUNK = int(os.getenv("IMPORT_CHUNK", "5000"))                    # rows per validation task
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 2)))
+
+# Column names seen in CRM/agency exports, mapped to lead fields.
+_ALIASES = {
+    "email": "email", "e-mail": "email", "email address": "email", "mail": "email", "ایمیل": "email",
+    "name": "name", "full name": "name", "full_name": "name", "fullname": "name", "نام": "name",
+    "username": "username", "telegram": "username", "user_id": "user_id",
+    "status": "status", "created_at": "created_at",
+}
+_SEPARATOR = re.compile(r"[\s,]*")
+
+
+# ========== READERS ==========
+def _iter_json_array(f, block: int = 1 << 16):
+    """Yield the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf, eof = f.read(block).lstrip(), False
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array")
+    buf = buf[1:]
+    while True:
+        buf = buf[_SEPARATOR.match(buf).end():]
+        if buf.startswith("]"):
+            return
+        try:
+            if not buf:
+                raise ValueError
+            item, end = decoder.raw_decode(buf)
+        except ValueError:
+            if eof:
+                raise ValueError("truncated JSON array")
+            more = f.read(block)
+            eof = not more
+            buf += more
+            continue
+        yield item
+        buf = buf[end:]
+
+
+def read_records(path: str, fmt: str = None):
+    """Stream raw records from CSV, JSON (array) or JSONL; '-' reads stdin."""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {".csv": "csv", ".json": "json"}.get(ext, "jsonl")
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "json":
+            yield from _iter_json_array(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None  # rejected as not_an_object, keeps row numbers aligned
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _chunks(records, size: int):
+    chunk = []
+    for rec in records:
+        chunk.append(rec)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ========== WORKER ==========
+def validate_chunk(start: int, records: list):
+    """Runs in a pool process: ([lead rows], [(row number, reason, raw email)])."""
+    rows, rejects = [], []
+    for n, rec in enumerate(records, start):
+        if isinstance(rec, dict):
+            rec = {_ALIASES.get(str(k).strip().lower(), k): v for k, v in rec.items()}
+        lead, reason = validate_record(rec)
+        if lead is None:
+            rejects.append((n, reason, rec.get("email") if isinstance(rec, dict) else None))
+            continue
+        # Imports keep history: status and registration time come from the source when present.
+        try:
+            if rec.get("status"):
+                lead.status = LeadStatus.parse(rec["status"])
+            if rec.get("created_at"):
+                lead.created_at = to_timestamp(rec["created_at"])
+            if rec.get("user_id"):
+                lead.user_id = int(rec["user_id"])
+        except (KeyError, ValueError, TypeError):
+            rejects.append((n, "invalid_field", rec.get("email")))
+            continue
+        rows.append(lead.to_row())
+    return rows, rejects
+
+
+# ========== IMPORT ==========
+def import_leads(records, store: LeadStore, workers: int = IMPORT_WORKERS, chunk_size: int = IMPORT_CHUNK,
+                 sheet: bool = True, sheet_url: str = None, rejects_file=None, progress=sys.stderr) -> dict:
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "rejected": 0, "sheet_rows": 0}
+    started = time.perf_counter()
+    writer = csv.writer(rejects_file) if rejects_file is not None else None
+    if writer:
+        writer.writerow(["row", "reason", "email"])
+
+    def collect(future):
+        rows, rejects = future.result()
+        stats["rejected"] += len(rejects)
+        if writer:
+            writer.writerows(rejects)
+        fresh, seen = [], set()  # earlier chunks are already in the store's index
+        for row in rows:
+            email = row[1]
+            if email in seen or email in store:
+                stats["duplicates"] += 1
+                continue
+            seen.add(email)
+            fresh.append(Lead.from_row(row))
+        if fresh:
+            store.extend(fresh)
+            stats["imported"] += len(fresh)
+            if sheet:
+                stats["sheet_rows"] += post_batch_to_sheet([lead.to_dict() for lead in fresh], url=sheet_url,
+                                                          batch_size=SHEET_BATCH_SIZE)
+        rate = stats["read"] / (time.perf_counter() - started)
+        print(f"… read {stats['read']}  imported {stats['imported']}  duplicates {stats['duplicates']}  "
+              f"rejected {stats['rejected']}  ({rate:.0f} rows/s)", file=progress)
+
+    # Results are collected in submission order with a bounded window, so memory stays flat
+    # however large the input is and row numbers in the rejects report stay in order.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = []
+        for chunk in _chunks(records, chunk_size):
+            window.append(pool.submit(validate_chunk, stats["read"] + 1, chunk))
+            stats["read"] += len(chunk)
+            if len(window) >= workers * 2:
+                collect(window.pop(0))
+        for future in window:
+            collect(future)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import leads from CSV/JSON/JSONL (stop the bot first)")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"])
+    parser.add_argument("--leads-file", default=LEADS_FILE)
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    parser.add_argument("--chunk", type=int, default=IMPORT_CHUNK)
+    parser.add_argument("--rejects", default="import_rejects.csv", help="CSV report of rejected rows")
+    parser.add_argument("--no-sheet", action="store_true", help="only write the local store")
+    args = parser.parse_args(argv)
+
+    store = LeadStore(args.leads_file).load()
+    with open(args.rejects, "w", encoding="utf-8", newline="") as rejects:
+        stats = import_leads(read_records(args.path, args.format), store, args.workers, args.chunk,
+                             sheet=not args.no_sheet, rejects_file=rejects)
+    store.compact()
+    print(f"✅ Import done: {stats} (rejects in {args.rejects})")
+
+
+if __name__ == "__main__":
+    main()
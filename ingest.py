@@ -0,0 +1,63 @@
+# ingest.py
+import os
+import threading
+
+import metrics
+from leads import Lead, LeadStatus, LeadStore, normalize_email, is_valid_email
+from sheet import SheetBatcher
+
+LEADS_API_KEY = os.getenv("LEADS_API_KEY", "")                   # Bearer token for POST /leads
+LEADS_MAX_BATCH = int(os.getenv("LEADS_MAX_BATCH", "1000"))      # records per request
+LEADS_RATE = float(os.getenv("LEADS_RATE", "2000"))              # records per second, sustained
+LEADS_BURST = float(os.getenv("LEADS_BURST", "5000"))
+
+# Serializes dedupe + append so two requests carrying the same email cannot both insert it.
+_lock = threading.Lock()
+
+
+def validate_record(rec):
+    """(Lead, None) for a raw {"name", "email", "username"?} record valid the way ask_email checks it, else (None, reason)."""
+    if not isinstance(rec, dict):
+        return None, "not_an_object"
+    raw = rec.get("email")
+    if not raw:
+        return None, "missing_email"
+    email = normalize_email(str(raw))
+    if not is_valid_email(email):
+        return None, "invalid_email"
+    name = str(rec.get("name") or "").strip()
+    return Lead(name, email, None, rec.get("username") or None, LeadStatus.VALIDATED), None
+
+
+def prepare(records, store: LeadStore):
+    """Validate and dedupe (within the batch and against the store). Returns (new leads, duplicate count, rejected [{"index", "reason"}])."""
+    leads, rejected, seen = [], [], set()
+    duplicates = 0
+    for i, rec in enumerate(records):
+        lead, reason = validate_record(rec)
+        if lead is None:
+            rejected.append({"index": i, "reason": reason})
+            continue
+        if lead.email in seen or lead.email in store:
+            duplicates += 1
+            continue
+        seen.add(lead.email)
+        leads.append(lead)
+    return leads, duplicates, rejected
+
+
+def ingest(records, store: LeadStore, batcher: SheetBatcher):
+    """Store new leads durably and queue them for the Sheet. Returns the summary, or None if the Sheet queue is full."""
+    with _lock:
+        leads, duplicates, rejected = prepare(records, store)
+        # Queue first: once stored, a retry of this request would see duplicates and never reach the Sheet.
+        if not batcher.offer(lead.to_dict() for lead in leads):
+            return None
+        if leads:
+            store.extend(leads)
+    # Outside the lock, so concurrent requests share one fsync instead of queueing for their own.
+    store.sync()
+    metrics.incr("leads_ingested", len(leads))
+    metrics.incr("leads_duplicate", duplicates)
+    metrics.incr("leads_rejected", len(rejected))
+    return {"accepted": len(leads), "duplicates": duplicates, "rejected": rejected}
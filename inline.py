@@ -0,0 +1,93 @@
+# inline.py
+import os
+import time
+import threading
+import contextvars
+import concurrent.futures
+
+from telegram.ext import ExtBot
+from telegram.request import RequestData
+from telegram.request._requestparameter import RequestParameter  # how Bot._do_post serializes (pinned PTB)
+
+import metrics
+
+INLINE_REPLY_WAIT = float(os.getenv("INLINE_REPLY_WAIT", "2"))   # max seconds the webhook waits for a handler
+
+# Set (per update task) by the webhook route for updates eligible for an inline reply.
+inline_reply = contextvars.ContextVar("inline_reply", default=None)
+
+OPEN, CAPTURED, TAKEN, CLOSED = range(4)
+
+
+class InlineReply:
+    """
+    Slot for answering one webhook update inside its HTTP response.
+
+    The first sendMessage a handler makes is captured instead of sent. If the handler finishes
+    within INLINE_REPLY_WAIT, the webhook returns that call as its response body and Telegram
+    performs it; any further Bot API call first flushes the captured message through the API,
+    so a handler that sends more than one message behaves exactly as before.
+    """
+
+    __slots__ = ("state", "request", "_lock")
+
+    def __init__(self):
+        self.state = OPEN
+        self.request = None
+        self._lock = threading.Lock()
+
+    def capture(self, data: dict, kwargs: dict) -> bool:
+        with self._lock:
+            if self.state != OPEN:
+                return False
+            self.state = CAPTURED
+            self.request = (data, kwargs)
+            return True
+
+    def release(self):
+        """Close the slot from the loop side; returns the captured call if it still has to be sent."""
+        with self._lock:
+            pending = self.request if self.state == CAPTURED else None
+            self.state = CLOSED
+            return pending
+
+    def wait(self, future: concurrent.futures.Future, timeout: float = INLINE_REPLY_WAIT):
+        """Called on the HTTP thread: the webhook response body (a method call), or None for plain "ok"."""
+        try:
+            future.result(timeout)
+        except Exception:
+            pass  # timed out or failed: answer with whatever was captured so far
+        with self._lock:
+            if self.state != CAPTURED:
+                self.state = CLOSED
+                return None
+            self.state = TAKEN
+            data, _ = self.request
+        params = RequestData([RequestParameter.from_input(k, v) for k, v in data.items()]).parameters
+        metrics.incr("inline_replies")
+        return {"method": "sendMessage", **params}
+
+
+class MutedReply(InlineReply):
+    """Swallows every sendMessage: used when re-feeding already answered updates to rebuild state."""
+
+    __slots__ = ()
+
+    def capture(self, data: dict, kwargs: dict) -> bool:
+        return True
+
+
+class InlineReplyBot(ExtBot):
+    """ExtBot that routes the first sendMessage of an inline-eligible update into its InlineReply slot."""
+
+    async def _do_post(self, endpoint, data, **kwargs):
+        slot = inline_reply.get()
+        if slot is not None:
+            if endpoint == "sendMessage" and slot.capture(data, kwargs):
+                # Stand-in result for the handler; the real message id is unknown until Telegram sends it.
+                return {"message_id": 0, "date": int(time.time()), "text": data.get("text", ""),
+                        "chat": {"id": data["chat_id"], "type": "private"}}
+            pending = slot.release()
+            if pending is not None:
+                await super()._do_post("sendMessage", pending[0], **pending[1])
+        return await super()._do_post(endpoint, data, **kwargs)
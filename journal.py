@@ -0,0 +1,196 @@
+# journal.py
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+import metrics
+from applog import get_logger
+
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "journal")
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "1") == "1"
+JOURNAL_COMMIT_MS = float(os.getenv("JOURNAL_COMMIT_MS", "2"))                   # group-commit window
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(64 << 20)))   # rotate after this size
+JOURNAL_RETENTION = int(os.getenv("JOURNAL_RETENTION", str(7 * 86400)))          # delete segments older than (s)
+JOURNAL_WAIT = float(os.getenv("JOURNAL_WAIT", "1"))                             # max wait for fsync per update
+
+log = get_logger("journal")
+
+
+class _Commit:
+    __slots__ = ("event", "ok")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.ok = False
+
+    def wait(self, timeout: float = JOURNAL_WAIT) -> bool:
+        """True once the record is on disk; False on timeout or write error."""
+        return self.event.wait(timeout) and self.ok
+
+
+class UpdateJournal:
+    """
+    Append-only journal of raw webhook updates, for crash recovery and traffic replay.
+
+    Segments `upd-NNNNNN.jsonl` hold {"op": "u", "tenant", "id", "ts", "data": <raw update>}
+    when an update arrives and {"op": "done", "tenant", "id"} once it has been processed.
+    A writer thread group-commits: everything appended while the previous fsync ran (plus a
+    JOURNAL_COMMIT_MS gather window) goes out in one write + one fsync, and every waiting
+    request is released together. Done markers are not waited for; losing one only means the
+    update is replayed again (at-least-once).
+    """
+
+    def __init__(self, directory: str = JOURNAL_DIR, segment_bytes: int = JOURNAL_SEGMENT_BYTES,
+                 commit_ms: float = JOURNAL_COMMIT_MS, retention: int = JOURNAL_RETENTION):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.window = commit_ms / 1000
+        self.retention = retention
+        self._lines = []
+        self._commits = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._file = None
+
+    def append(self, tenant: str, update_id: int, raw: bytes) -> _Commit:
+        if b"\n" in raw:
+            raw = json.dumps(json.loads(raw), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        line = b'{"op":"u","tenant":%s,"id":%d,"ts":%d,"data":%s}\n' % (
+            json.dumps(tenant).encode(), update_id, int(time.time()), raw)
+        commit = _Commit()
+        self._submit(line, commit)
+        return commit
+
+    def done(self, tenant: str, update_id: int):
+        self._submit(b'{"op":"done","tenant":%s,"id":%d}\n' % (json.dumps(tenant).encode(), update_id), None)
+
+    def sync(self, timeout: float = None) -> bool:
+        """Block until everything appended so far (done markers included) is on disk."""
+        commit = _Commit()
+        self._submit(b"", commit)
+        return commit.wait(timeout)
+
+    def _submit(self, line: bytes, commit):
+        with self._cond:
+            self._lines.append(line)
+            if commit is not None:
+                self._commits.append(commit)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="update-journal", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._lines:
+                    self._cond.wait()
+                if self._commits and self.window > 0:
+                    self._cond.wait(self.window)  # gather concurrent requests into this commit
+                lines, commits = self._lines, self._commits
+                self._lines, self._commits = [], []
+            ok = self._write(lines, sync=bool(commits))
+            for commit in commits:
+                commit.ok = ok
+                commit.event.set()
+            if commits:
+                metrics.incr("journal_commits")
+                metrics.incr("journal_records", len(commits))
+
+    def _write(self, lines, sync: bool) -> bool:
+        try:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            return True
+        except OSError:
+            log.exception("❌ Journal write failed")
+            metrics.incr("journal_errors")
+            return False
+
+    def _rotate(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+        segments = list_segments(self.directory)
+        number = int(os.path.basename(segments[-1])[4:10]) + 1 if segments else 1
+        while True:
+            try:  # exclusive create: never append to a segment another process still has open
+                self._file = open(os.path.join(self.directory, f"upd-{number:06d}.jsonl"), "xb")
+                break
+            except FileExistsError:
+                number += 1
+        cutoff = time.time() - self.retention
+        for path in segments:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+
+# ========== READING ==========
+def list_segments(directory: str = JOURNAL_DIR) -> list:
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith("upd-") and n.endswith(".jsonl"))
+    return [os.path.join(directory, n) for n in names]
+
+
+def iter_records(directory: str = JOURNAL_DIR):
+    """Every journal record in write order; a torn last line (crash mid-write) is skipped."""
+    for path in list_segments(directory):
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def iter_updates(directory: str = JOURNAL_DIR, tenant: str = None):
+    """(tenant, raw update dict) in arrival order: a realistic traffic source for benchmarks."""
+    for rec in iter_records(directory):
+        if rec["op"] == "u" and (tenant is None or rec["tenant"] == tenant):
+            yield rec["tenant"], rec["data"]
+
+
+def unfinished(directory: str = JOURNAL_DIR) -> list:
+    """Update records without a done marker, in arrival order."""
+    pending = {}
+    for rec in iter_records(directory):
+        key = (rec["tenant"], rec["id"])
+        if rec["op"] == "u":
+            pending[key] = rec
+        else:
+            pending.pop(key, None)
+    return list(pending.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Raw update journal (unfinished updates are replayed when the bot starts)")
+    parser.add_argument("--dir", default=JOURNAL_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="count updates and unfinished updates")
+    p_cat = sub.add_parser("cat", help="print journaled updates as JSONL (traffic for benchmarks)")
+    p_cat.add_argument("--tenant")
+    p_cat.add_argument("--unfinished", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "stats":
+        total = sum(1 for _ in iter_updates(args.dir))
+        print(f"segments={len(list_segments(args.dir))} updates={total} unfinished={len(unfinished(args.dir))}")
+    elif args.unfinished:
+        for rec in unfinished(args.dir):
+            if args.tenant is None or rec["tenant"] == args.tenant:
+                sys.stdout.write(json.dumps(rec["data"], ensure_ascii=False) + "\n")
+    else:
+        for _, data in iter_updates(args.dir, args.tenant):
+            sys.stdout.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+# leads.py
+import gc
+import os
+import re
+import json
+import threading
+from array import array
+from enum import IntEnum
+from datetime import datetime, timezone
+
+from applog import get_logger
+
+LEADS_FILE = os.getenv("LEADS_FILE", "leads.jsonl")
+LEGACY_LEADS_FILE = "leads.json"
+
+# Minified JSON: no spaces after separators, UTF-8 kept as-is (Persian names).
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+log = get_logger("leads")
+
+
+class LeadStatus(IntEnum):
+    PENDING = 0
+    VALIDATED = 1
+    VERIFIED = 2
+    INVALID = 3
+
+    @property
+    def label(self) -> str:
+        return self.name.capitalize()
+
+    @classmethod
+    def parse(cls, value) -> "LeadStatus":
+        if isinstance(value, int):
+            return _STATUSES[value]
+        return cls[str(value).strip().upper()]
+
+
+_STATUSES = tuple(LeadStatus)
+
+EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+
+def normalize_email(raw: str) -> str:
+    if not raw:
+        return ""
+    return raw.replace("\u200c", "").replace("\u200f", "").strip().lower()
+
+
+def is_valid_email(email: str) -> bool:
+    return EMAIL_RE.match(email.strip()) if email else False
+
+
+def to_timestamp(value) -> int:
+    """Accept an epoch int or a legacy ISO string ("2025-11-01T10:00:00.123Z")."""
+    if value is None or value == "":
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp())
+
+
+class Lead:
+    """One registered lead. Fixed schema; `status` is a LeadStatus, `created_at` epoch seconds (UTC)."""
+
+    __slots__ = ("name", "email", "user_id", "username", "status", "created_at")
+
+    def __init__(self, name, email, user_id=None, username=None,
+                 status=LeadStatus.VALIDATED, created_at=None):
+        self.name = name
+        self.email = email
+        self.user_id = user_id
+        self.username = username
+        self.status = status
+        self.created_at = created_at if created_at is not None else int(datetime.now(timezone.utc).timestamp())
+
+    def to_row(self) -> list:
+        return [self.name, self.email, self.user_id, self.username, int(self.status), self.created_at]
+
+    @classmethod
+    def from_row(cls, row) -> "Lead":
+        lead = cls.__new__(cls)
+        lead.name, lead.email, lead.user_id, lead.username, status, lead.created_at = row
+        lead.status = _STATUSES[status]
+        return lead
+
+    def to_dict(self) -> dict:
+        """Legacy dict shape, as posted to the Google Sheet."""
+        return {
+            "name": self.name,
+            "email": self.email,
+            "user_id": self.user_id,
+            "username": self.username,
+            "status": self.status.label,
+            "created_at": datetime.fromtimestamp(self.created_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Lead":
+        return cls(
+            d.get("name", ""),
+            d.get("email", ""),
+            d.get("user_id"),
+            d.get("username"),
+            LeadStatus.parse(d.get("status", "Validated")),
+            to_timestamp(d.get("created_at")),
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Lead) and self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f"Lead({self.email!r}, {self.status.label})"
+
+
+# ========== CODEC ==========
+def encode_lead(lead: Lead) -> str:
+    return _encoder.encode(lead.to_row())
+
+
+def decode_lead(line: str) -> Lead:
+    return Lead.from_row(json.loads(line))
+
+
+def encode_leads(leads) -> str:
+    """One minified JSON row per line."""
+    return "".join(_encoder.encode(lead.to_row()) + "\n" for lead in leads)
+
+
+def parse_rows(text: str) -> tuple:
+    """(rows, skipped): rows of a JSONL text, dropping lines that don't parse (blank, or torn by a crash mid-append)."""
+    text = text.strip("\n")
+    if not text:
+        return [], 0
+    # Hundreds of thousands of small lists would trigger many useless cyclic-GC passes.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        # Parsing all rows as one JSON array is much faster than json.loads per line.
+        return json.loads("[" + text.replace("\n", ",") + "]"), 0
+    except ValueError:
+        rows, skipped = [], 0
+        for n, line in enumerate(text.split("\n"), 1):
+            if not line.strip():
+                skipped += 1
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                log.warning("⚠️ Skipping unreadable lead row %s: %.80r", n, line)
+                skipped += 1
+        return rows, skipped
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_rows(text: str) -> list:
+    return parse_rows(text)[0]
+
+
+def decode_leads(text: str) -> list:
+    from_row = Lead.from_row
+    return [from_row(row) for row in decode_rows(text)]
+
+
+# ========== STORE ==========
+_STATUS_TO_CHAR = bytes.maketrans(bytes(range(10)), b"0123456789")
+_CHAR_TO_STATUS = bytes.maketrans(b"0123456789", bytes(range(10)))
+
+
+class LeadStore:
+    """
+    Array-backed lead table, indexed by email and persisted as a JSONL file.
+    Columns hold plain values (status in a bytearray, user_id/created_at in int64 arrays), so a
+    lead costs a few pointers instead of a dict; Lead objects are only built on read.
+
+    File layout: an optional first line with a columnar snapshot ({"columns": [...]}, written
+    by `compact()`), then one minified row per add/status change. A later row for the same
+    email replaces the earlier one. `load()` compacts whenever it finds such rows.
+    """
+
+    def __init__(self, path: str = LEADS_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._appended = 0            # appends made, and how many of them the last fsync covered
+        self._synced = 0
+        self._sync_lock = threading.Lock()
+        self._reset_columns([[], [], [], [], "", []])
+
+    def _reset_columns(self, cols):
+        names, emails, user_ids, usernames, statuses, created = cols
+        self._names = names
+        self._emails = emails
+        self._user_ids = array("q", user_ids)  # 0 = no Telegram user
+        self._usernames = usernames
+        self._status = bytearray(statuses, "ascii").translate(_CHAR_TO_STATUS)
+        self._created = array("q", created)
+        self._index = None
+
+    def _email_index(self) -> dict:
+        # Built on first lookup rather than on load: hashing every email is the costliest part of a load.
+        if self._index is None:
+            index = dict(zip(self._emails, range(len(self._emails))))
+            if len(index) != len(self._emails):
+                # Duplicate emails (rows replayed from the file): keep the last row of each,
+                # at the position the email first appeared.
+                self._select([index[email] for email in dict.fromkeys(self._emails)])
+                index = dict(zip(self._emails, range(len(self._emails))))
+            self._index = index
+        return self._index
+
+    def _select(self, keep: list):
+        """Keep only the rows at positions `keep`, in that order."""
+        cols = self._columns()
+        self._reset_columns([
+            [cols[0][i] for i in keep],
+            [cols[1][i] for i in keep],
+            [cols[2][i] for i in keep],
+            [cols[3][i] for i in keep],
+            "".join(cols[4][i] for i in keep),
+            [cols[5][i] for i in keep],
+        ])
+
+    def _columns(self) -> list:
+        return [self._names, self._emails, self._user_ids.tolist(), self._usernames,
+                self._status.translate(_STATUS_TO_CHAR).decode("ascii"), self._created.tolist()]
+
+    def _row(self, i: int) -> list:
+        return [self._names[i], self._emails[i], self._user_ids[i] or None, self._usernames[i],
+                self._status[i], self._created[i]]
+
+    def _put(self, lead: Lead):
+        index = self._email_index()
+        i = index.get(lead.email)
+        if i is None:
+            index[lead.email] = len(self._emails)
+            self._names.append(lead.name)
+            self._emails.append(lead.email)
+            self._user_ids.append(lead.user_id or 0)
+            self._usernames.append(lead.username)
+            self._status.append(int(lead.status))
+            self._created.append(lead.created_at)
+            return True
+        self._names[i] = lead.name
+        self._user_ids[i] = lead.user_id or 0
+        self._usernames[i] = lead.username
+        self._status[i] = int(lead.status)
+        self._created[i] = lead.created_at
+        return False
+
+    def load(self, legacy_path: str = LEGACY_LEADS_FILE) -> "LeadStore":
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    tail = self.loads(f.read())
+                if tail:
+                    # Fold the rows appended since the last snapshot into a new one (dropping any torn
+                    # last row), so the next start is a single columnar decode.
+                    self.compact()
+            elif legacy_path and os.path.exists(legacy_path):
+                # One-off migration from the old indent=2 leads.json list of dicts.
+                try:
+                    with open(legacy_path, "r", encoding="utf-8") as f:
+                        legacy = json.load(f)
+                except Exception:
+                    legacy = []
+                self._reset_columns([[], [], [], [], "", []])
+                for d in legacy:
+                    self._put(Lead.from_dict(d))
+                self.compact()
+            else:
+                self._reset_columns([[], [], [], [], "", []])
+        return self
+
+    def loads(self, text: str) -> int:
+        """Replace the contents with a dumps()/file text; returns the number of lines after the snapshot (skipped ones included)."""
+        with self._lock:
+            if text.startswith('{"columns"'):
+                snapshot, _, text = text.partition("\n")
+                self._reset_columns(json.loads(snapshot)["columns"])
+            else:
+                self._reset_columns([[], [], [], [], "", []])
+            rows, skipped = parse_rows(text)
+            if rows:
+                # Appended column-wise, then the index build folds replaced rows into the originals.
+                self._names.extend([r[0] for r in rows])
+                self._emails.extend([r[1] for r in rows])
+                self._user_ids.extend([r[2] or 0 for r in rows])
+                self._usernames.extend([r[3] for r in rows])
+                self._status.extend([r[4] for r in rows])
+                self._created.extend([r[5] for r in rows])
+                self._index = None
+                self._email_index()
+            return len(rows) + skipped
+
+    def dumps(self) -> str:
+        with self._lock:
+            return _encoder.encode({"columns": self._columns()}) + "\n"
+
+    def _append(self, text: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+        self._appended += 1
+
+    def sync(self):
+        """
+        Block until every append made so far is on disk. Group commit: callers that arrive while
+        an fsync runs share the next one, so N concurrent writers cost ~2 fsyncs, not N.
+        """
+        target = self._appended
+        with self._sync_lock:
+            if self._synced >= target:
+                return
+            covered = self._appended
+            fd = os.open(self.path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = covered
+
+    def subscribe(self, callback):
+        """Call `callback(lead)` for every lead stored through add()/extend() (e.g. the search index)."""
+        self._listeners.append(callback)
+
+    def _notify(self, leads):
+        for callback in self._listeners:
+            for lead in leads:
+                callback(lead)
+
+    def add(self, lead: Lead) -> bool:
+        """Store (or replace) a lead. Returns True if the email was not known before."""
+        with self._lock:
+            is_new = self._put(lead)
+            self._append(encode_lead(lead) + "\n")
+        self._notify((lead,))
+        return is_new
+
+    def extend(self, leads) -> int:
+        """Batch version of add() with a single file write."""
+        leads = list(leads)
+        with self._lock:
+            for lead in leads:
+                self._put(lead)
+            self._append(encode_leads(leads))
+        self._notify(leads)
+        return len(leads)
+
+    def set_status(self, email: str, status: LeadStatus) -> bool:
+        with self._lock:
+            i = self._email_index().get(email)
+            if i is None:
+                return False
+            self._status[i] = int(status)
+            self._append(_encoder.encode(self._row(i)) + "\n")
+            return True
+
+    def set_statuses(self, changes: dict) -> int:
+        """Batch version of set_status() for {email: status}; one file write, unknown emails skipped."""
+        with self._lock:
+            index = self._email_index()
+            rows = []
+            for email, status in changes.items():
+                i = index.get(email)
+                if i is not None:
+                    self._status[i] = int(status)
+                    rows.append(_encoder.encode(self._row(i)) + "\n")
+            if rows:
+                self._append("".join(rows))
+            return len(rows)
+
+    def remove(self, emails) -> int:
+        """Drop leads by email and rewrite the file without them."""
+        with self._lock:
+            gone = set(emails) & self._email_index().keys()
+            if gone:
+                self._select([i for i, email in enumerate(self._emails) if email not in gone])
+                self.compact()
+            return len(gone)
+
+    def compact(self):
+        with self._lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.dumps())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+
+    def get(self, email: str):
+        # Under the lock: remove() swaps every column from the archiving thread, and the index
+        # must be read together with the columns it points into.
+        with self._lock:
+            i = self._email_index().get(email)
+            return None if i is None else Lead.from_row(self._row(i))
+
+    def __contains__(self, email):
+        with self._lock:
+            return email in self._email_index()
+
+    def __len__(self):
+        return len(self._emails)
+
+    def __iter__(self):
+        with self._lock:
+            rows = [self._row(i) for i in range(len(self._emails))]
+        return map(Lead.from_row, rows)
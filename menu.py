@@ -0,0 +1,64 @@
+# menu.py
+from telegram import ReplyKeyboardMarkup
+from telegram.ext import filters
+
+from search import normalize_text
+
+
+def normalize_button(text: str) -> str:
+    """Routing key for button text: search normalization (ZWNJ/space/case-insensitive), no emoji variation selectors."""
+    return normalize_text(text.replace("\ufe0f", "")) if text else ""
+
+
+class MenuRouter:
+    """
+    Routes menu button text to a handler with one dict lookup.
+
+    Built from a declarative menu: rows of {"key", "label", "aliases"}. Every label and alias
+    (Persian, English, with or without emoji) maps to the item's key; `keyboard()` builds the
+    reply keyboard from the labels and `on(key, callback)` attaches the handler.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._routes = {}
+        self._callbacks = {}
+        for row in rows:
+            for item in row:
+                for text in (item["label"], *item.get("aliases", ())):
+                    self._routes[normalize_button(text)] = item["key"]
+
+    def keyboard(self) -> ReplyKeyboardMarkup:
+        return ReplyKeyboardMarkup([[item["label"] for item in row] for row in self.rows], resize_keyboard=True)
+
+    def match(self, text: str):
+        return self._routes.get(normalize_button(text))
+
+    def on(self, key: str, callback):
+        self._callbacks[key] = callback
+
+    def filter(self, keys=None) -> filters.MessageFilter:
+        """Message filter accepting menu texts whose key is in `keys` (default: keys with a callback)."""
+        return _MenuFilter(self, keys)
+
+    async def dispatch(self, update, context):
+        callback = self._callbacks.get(self.match(update.message.text))
+        if callback is not None:
+            return await callback(update, context)
+
+
+class _MenuFilter(filters.MessageFilter):
+    __slots__ = ("router", "keys")
+
+    def __init__(self, router: MenuRouter, keys=None):
+        super().__init__(name=f"MenuFilter({sorted(keys) if keys else 'routed'})")
+        self.router = router
+        self.keys = set(keys) if keys else None
+
+    def filter(self, message) -> bool:
+        if not message.text:
+            return False
+        key = self.router.match(message.text)
+        if key is None:
+            return False
+        return key in self.keys if self.keys is not None else key in self.router._callbacks
@@ -0,0 +1,22 @@
+# metrics.py
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+
+
+def incr(name: str, value: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name: str, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def snapshot() -> dict:
+    """Return a copy of all counters and gauges (served on /metrics)."""
+    with _lock:
+        return {"counters": dict(_counters), "gauges": dict(_gauges)}
@@ -0,0 +1,77 @@
+# polling.py
+import os
+import asyncio
+from telegram.error import TelegramError, RetryAfter
+
+from applog import get_logger
+
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", "100"))     # getUpdates limit (Telegram max is 100)
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", "30"))             # long-poll seconds
+POLL_CONCURRENCY = int(os.getenv("POLL_CONCURRENCY", "32"))     # users processed in parallel per batch
+
+log = get_logger("polling")
+
+
+def _update_key(update):
+    # Updates of the same user/chat must stay ordered (ConversationHandler state), others run in parallel.
+    if update.effective_user:
+        return ("u", update.effective_user.id)
+    if update.effective_chat:
+        return ("c", update.effective_chat.id)
+    return ("id", update.update_id)
+
+
+async def process_batch(application, updates, concurrency: int = POLL_CONCURRENCY):
+    """Process one getUpdates batch: sequential per user, concurrent across users."""
+    groups = {}
+    for update in updates:
+        groups.setdefault(_update_key(update), []).append(update)
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run_group(group):
+        async with sem:
+            for update in group:
+                try:
+                    await application.process_update(update)
+                except Exception:
+                    log.exception("❌ Polling: update failed", extra={"update_id": update.update_id})
+
+    await asyncio.gather(*(run_group(g) for g in groups.values()))
+
+
+async def run_polling(application, allowed_updates=None, batch_size: int = POLL_BATCH_SIZE,
+                      poll_timeout: int = POLL_TIMEOUT, concurrency: int = POLL_CONCURRENCY):
+    """
+    Long-poll getUpdates in large batches.
+    The offset is only advanced after a batch has been fully processed, so a crash
+    mid-batch means the batch is delivered again instead of being lost.
+    """
+    bot = application.bot
+    await bot.delete_webhook(drop_pending_updates=False)
+    log.info("✅ Webhook removed — polling for updates.")
+
+    offset = None
+    backoff = 1
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                limit=batch_size,
+                timeout=poll_timeout,
+                allowed_updates=allowed_updates,
+            )
+            backoff = 1
+        except RetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            continue
+        except TelegramError as e:
+            log.warning("⚠️ getUpdates failed (%s), retrying in %ss", e, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+            continue
+
+        if not updates:
+            continue
+        await process_batch(application, updates, concurrency)
+        offset = updates[-1].update_id + 1
@@ -0,0 +1,156 @@
+# resilience.py
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from applog import get_logger
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))         # consecutive failures that open a breaker
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))      # seconds open before a half-open probe
+TIMEOUT_PERCENTILE = float(os.getenv("TIMEOUT_PERCENTILE", "0.99"))
+TIMEOUT_FACTOR = float(os.getenv("TIMEOUT_FACTOR", "3"))           # timeout = factor x observed percentile
+TIMEOUT_MIN = float(os.getenv("TIMEOUT_MIN", "1"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))           # recent successful calls kept per dependency
+LATENCY_MIN_SAMPLES = 20                                           # below this, use the dependency's max timeout
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+log = get_logger("resilience")
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class Dependency:
+    """
+    Circuit breaker plus adaptive timeout for one external service.
+
+    After BREAKER_FAILURES consecutive failures the breaker opens and calls fail fast with
+    CircuitOpen. Once BREAKER_COOLDOWN has passed, one probe call is let through (half-open).
+    If it succeeds the breaker closes, and if it fails the breaker opens again. The timeout
+    offered to each call is TIMEOUT_FACTOR x the TIMEOUT_PERCENTILE of recent successful
+    latencies, clamped to [TIMEOUT_MIN, max_timeout].
+    """
+
+    def __init__(self, name: str, max_timeout: float, failures: int = BREAKER_FAILURES,
+                 cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def percentile(self, p: float):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+    def timeout(self, cap: float = None) -> float:
+        cap = min(cap, self.max_timeout) if cap else self.max_timeout
+        if len(self._latencies) < LATENCY_MIN_SAMPLES:
+            return cap
+        return max(TIMEOUT_MIN, min(cap, self.percentile(TIMEOUT_PERCENTILE) * TIMEOUT_FACTOR))
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through (0 if calls are allowed)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def _success(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self._failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def _failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._set_state(OPEN)
+        metrics.incr(f"{self.name}_failures")
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.incr(f"{self.name}_breaker_{state}")
+        log.warning("⚡ %s breaker %s", self.name, state, extra={"dependency": self.name})
+
+    @contextmanager
+    def guard(self, cap: float = None, ignore=()):
+        """
+        Wrap one call: yields the timeout to use, records latency on success and a failure on
+        any exception except `ignore` (errors that say nothing about the service's health).
+        Raises CircuitOpen without running the block while the breaker is open.
+        """
+        if not self._allow():
+            metrics.incr(f"{self.name}_short_circuited")
+            raise CircuitOpen(self.name)
+        start = time.perf_counter()
+        try:
+            yield self.timeout(cap)
+        except ignore:
+            self._success(time.perf_counter() - start)
+            raise
+        except Exception:
+            self._failure()
+            raise
+        self._success(time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        p50, p99 = self.percentile(0.5), self.percentile(0.99)
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "timeout": round(self.timeout(), 3),
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p99": round(p99, 3) if p99 is not None else None,
+            "samples": len(self._latencies),
+        }
+
+
+_dependencies = {}
+_registry_lock = threading.Lock()
+
+
+def dependency(name: str, max_timeout: float) -> Dependency:
+    """The process-wide Dependency for `name` (created on first use)."""
+    with _registry_lock:
+        dep = _dependencies.get(name)
+        if dep is None:
+            dep = _dependencies[name] = Dependency(name, max_timeout)
+        return dep
+
+
+def snapshot() -> dict:
+    """Breaker state and latency per dependency (served on /metrics)."""
+    with _registry_lock:
+        deps = list(_dependencies.values())
+    return {dep.name: dep.snapshot() for dep in deps}
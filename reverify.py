@@ -0,0 +1,313 @@
+# reverify.py
+import os
+import re
+import json
+import time
+import email
+import socket
+import smtplib
+import imaplib
+import argparse
+import threading
+from functools import lru_cache
+from email.message import EmailMessage
+from concurrent.futures import ThreadPoolExecutor
+
+from applog import get_logger
+from leads import LeadStore, LeadStatus, LEADS_FILE, normalize_email, is_valid_email
+from sheet import post_batch_to_sheet
+from resilience import dependency, CircuitOpen
+
+try:
+    import dns.resolver  # optional (dnspython): real MX lookups for the domain pre-screen
+except ImportError:
+    dns = None
+
+SMTP_EMAIL = os.getenv("SMTP_EMAIL")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"            # 0 for plain local stubs
+IMAP_HOST = os.getenv("IMAP_HOST", "imap.gmail.com")
+IMAP_PORT = int(os.getenv("IMAP_PORT", "993"))
+IMAP_SSL = os.getenv("IMAP_SSL", "1") == "1"
+BOUNCE_SENDER = os.getenv("BOUNCE_SENDER", "mailer-daemon")
+REVERIFY_WORKERS = int(os.getenv("REVERIFY_WORKERS", "8"))        # concurrent SMTP connections
+REVERIFY_BATCH = int(os.getenv("REVERIFY_BATCH", "200"))          # sends per checkpoint flush
+REVERIFY_WAIT = int(os.getenv("REVERIFY_WAIT", "300"))            # seconds to let bounces arrive
+REVERIFY_CHECKPOINT = os.getenv("REVERIFY_CHECKPOINT", "reverify.checkpoint.jsonl")
+
+log = get_logger("reverify")
+
+SMTP = dependency("smtp", max_timeout=30)
+IMAP = dependency("imap", max_timeout=60)
+
+BOUNCE_MARKERS = ("address not found", "no such user", "user unknown", "5.1.1", "does not exist")
+_ADDRESS_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+
+# Per-lead outcomes recorded in the checkpoint.
+SENT, INVALID = "sent", "invalid"
+
+
+# ========== PRE-SCREEN ==========
+@lru_cache(maxsize=None)
+def domain_resolves(domain: str) -> bool:
+    """True if the domain can receive mail: MX records, or an address record (implicit MX)."""
+    if dns is not None:
+        try:
+            dns.resolver.resolve(domain, "MX")
+            return True
+        except dns.resolver.NXDOMAIN:
+            return False
+        except Exception:
+            pass
+    try:
+        socket.getaddrinfo(domain, 25)
+        return True
+    except socket.gaierror:
+        return False
+
+
+def screen(address: str, check_dns: bool = True) -> bool:
+    if not is_valid_email(address):
+        return False
+    return not check_dns or domain_resolves(address.rsplit("@", 1)[1])
+
+
+# ========== SMTP ==========
+def verification_message(name: str, recipient: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = "ClientFlow Email Verification"
+    msg["From"] = SMTP_EMAIL or "noreply@localhost"
+    msg["To"] = recipient
+    msg.set_content(
+        f"Hello {name or 'there'},\n\n"
+        "This is a verification email from ClientFlow Digital Marketing.\n"
+        "If you received this, it means your email address is working correctly.\n\n"
+        "Thank you!\nClientFlow Team"
+    )
+    return msg
+
+
+class Mailer:
+    """One SMTP connection per worker thread, reused across messages and reopened if dropped."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self, timeout: float):
+        cls = smtplib.SMTP_SSL if SMTP_SSL else smtplib.SMTP
+        smtp = cls(SMTP_HOST, SMTP_PORT, timeout=timeout)
+        if SMTP_EMAIL and SMTP_PASSWORD:
+            smtp.login(SMTP_EMAIL, SMTP_PASSWORD)
+        with self._lock:
+            self._connections.append(smtp)
+        self._local.smtp = smtp
+        return smtp
+
+    def send(self, name: str, recipient: str) -> str:
+        """
+        SENT, INVALID (a permanent 5xx about this recipient or message), or None for a transient
+        failure. Authentication and sender errors abort the run: they'd fail every lead the same way.
+        """
+        msg = verification_message(name, recipient)
+        for attempt in (1, 2):
+            try:
+                # A refusal is an answer from a healthy server, not a failure.
+                with SMTP.guard(ignore=(smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError)) as timeout:
+                    smtp = getattr(self._local, "smtp", None) or self._connect(timeout)
+                    smtp.sock.settimeout(timeout)
+                    smtp.send_message(msg)
+                return SENT
+            except CircuitOpen:
+                return None
+            except (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused):
+                raise
+            except smtplib.SMTPRecipientsRefused as e:
+                code = next(iter(e.recipients.values()))[0]
+                return INVALID if code >= 500 else None
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    return INVALID
+                log.warning("⚠️ SMTP %s for %s: %s", e.smtp_code, recipient, e.smtp_error)
+                return None
+            except (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout):
+                self._local.smtp = None
+                if attempt == 2:
+                    log.warning("⚠️ SMTP connection failed for %s", recipient)
+            except (smtplib.SMTPException, OSError) as e:
+                self._local.smtp = None
+                log.warning("⚠️ SMTP error for %s: %s", recipient, e)
+                return None
+        return None
+
+    def close(self):
+        with self._lock:
+            for smtp in self._connections:
+                try:
+                    smtp.quit()
+                except Exception:
+                    pass
+            self._connections.clear()
+
+
+# ========== IMAP ==========
+def collect_bounces(candidates: set, since: float) -> set:
+    """One pass over bounce notifications received since `since`; returns the bounced addresses among `candidates`."""
+    cls = imaplib.IMAP4_SSL if IMAP_SSL else imaplib.IMAP4
+    with IMAP.guard() as timeout:
+        mail = cls(IMAP_HOST, IMAP_PORT, timeout=timeout)
+    bounced = set()
+    try:
+        with IMAP.guard() as timeout:
+            mail.sock.settimeout(timeout)
+            if SMTP_EMAIL and SMTP_PASSWORD:
+                mail.login(SMTP_EMAIL, SMTP_PASSWORD)
+            mail.select("inbox", readonly=True)
+            day = time.strftime("%d-%b-%Y", time.gmtime(since))
+            result, data = mail.search(None, f'(FROM "{BOUNCE_SENDER}" SINCE "{day}")')
+        if result != "OK":
+            return bounced
+        ids = data[0].split()
+        for start in range(0, len(ids), 200):
+            with IMAP.guard() as timeout:
+                mail.sock.settimeout(timeout)
+                result, parts = mail.fetch(b",".join(ids[start:start + 200]).decode(), "(BODY.PEEK[])")
+            if result != "OK":
+                continue
+            for part in parts:
+                if not isinstance(part, tuple):
+                    continue
+                text = email.message_from_bytes(part[1]).as_bytes().decode("utf-8", "ignore").lower()
+                if any(marker in text for marker in BOUNCE_MARKERS):
+                    bounced.update(a for a in map(str.lower, _ADDRESS_RE.findall(text)) if a in candidates)
+    finally:
+        try:
+            mail.logout()
+        except Exception:
+            pass
+    return bounced
+
+
+# ========== CHECKPOINT ==========
+class Checkpoint:
+    """
+    JSONL journal of outcomes: a header {"since": ts} followed by {"email", "result"} lines,
+    fsynced per batch. A rerun skips everything already recorded; the file is removed once
+    statuses are written back.
+    """
+
+    def __init__(self, path: str = REVERIFY_CHECKPOINT):
+        self.path = path
+        self.since = time.time()
+        self.results = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    rec = json.loads(line)
+                    if "since" in rec:
+                        self.since = rec["since"]
+                    else:
+                        self.results[rec["email"]] = rec["result"]
+        else:
+            self._write([{"since": self.since}])
+
+    def _write(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(r) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, outcomes: dict):
+        self.results.update(outcomes)
+        self._write([{"email": e, "result": r} for e, r in outcomes.items()])
+
+    def finish(self):
+        os.remove(self.path)
+
+
+# ========== RUN ==========
+def candidates(store: LeadStore, done: dict):
+    """Stream leads still Pending/Validated that the checkpoint has no outcome for."""
+    for lead in store:
+        if lead.status in (LeadStatus.PENDING, LeadStatus.VALIDATED) and lead.email not in done:
+            yield lead
+
+
+def _batches(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reverify(store: LeadStore, checkpoint: Checkpoint, workers: int = REVERIFY_WORKERS,
+             wait: int = REVERIFY_WAIT, check_dns: bool = True, sheet_url: str = None) -> dict:
+    mailer = Mailer()
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for batch in _batches(candidates(store, checkpoint.results), REVERIFY_BATCH):
+                outcomes, to_send = {}, []
+                for lead in batch:
+                    address = normalize_email(lead.email)
+                    if screen(address, check_dns):
+                        to_send.append(lead)
+                    else:
+                        outcomes[lead.email] = INVALID
+                for lead, result in zip(to_send, pool.map(lambda l: mailer.send(l.name, l.email), to_send)):
+                    if result is None:
+                        failed += 1  # transient: no outcome recorded, retried on the next run
+                    else:
+                        outcomes[lead.email] = result
+                checkpoint.record(outcomes)
+                print(f"… {len(checkpoint.results)} checked, {failed} deferred")
+    finally:
+        mailer.close()
+
+    sent = {e for e, r in checkpoint.results.items() if r == SENT}
+    bounced = set()
+    if sent:
+        if wait > 0:
+            print(f"⏳ Waiting {wait}s for bounces")
+            time.sleep(wait)
+        bounced = collect_bounces(sent, checkpoint.since)
+
+    changes = {e: LeadStatus.INVALID if r == INVALID or e in bounced else LeadStatus.VERIFIED
+               for e, r in checkpoint.results.items()}
+    store.set_statuses(changes)
+    rows = [lead.to_dict() for lead in map(store.get, changes) if lead is not None]
+    posted = post_batch_to_sheet(rows, url=sheet_url)
+    checkpoint.finish()
+    verified = sum(1 for s in changes.values() if s == LeadStatus.VERIFIED)
+    return {"verified": verified, "invalid": len(changes) - verified, "deferred": failed, "sheet_rows": posted}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-verify Pending/Validated leads by mail and bounce check "
+                                                 "(stop the bot first; rerun to resume)")
+    parser.add_argument("--leads-file", default=LEADS_FILE)
+    parser.add_argument("--checkpoint", default=REVERIFY_CHECKPOINT)
+    parser.add_argument("--workers", type=int, default=REVERIFY_WORKERS)
+    parser.add_argument("--wait", type=int, default=REVERIFY_WAIT, help="seconds to wait before the IMAP pass")
+    parser.add_argument("--no-dns", action="store_true", help="skip the domain resolution pre-screen")
+    args = parser.parse_args(argv)
+
+    store = LeadStore(args.leads_file).load()
+    try:
+        summary = reverify(store, Checkpoint(args.checkpoint), args.workers, args.wait, not args.no_dns)
+    except (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused) as e:
+        raise SystemExit(f"❌ SMTP rejected the sending account: {e} (progress kept in {args.checkpoint})")
+    print(f"✅ Re-verification done: {summary}")
+
+
+if __name__ == "__main__":
+    main()
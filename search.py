@@ -0,0 +1,138 @@
+# search.py
+import re
+import threading
+import unicodedata
+from array import array
+
+SEARCH_LIMIT = 10
+MIN_QUERY = 3                  # trigram index: shorter queries can't be answered from postings
+FUZZY_MIN_SCORE = 0.5          # share of query trigrams a fuzzy hit must contain
+FUZZY_SCAN = 20_000            # newest postings per trigram considered for fuzzy candidates
+
+# Arabic code points commonly typed on Persian keyboards, Persian/Arabic digits, and
+# invisible joiners/marks. ZWNJ and spaces are removed entirely so that
+# "محمد‌حسین", "محمد حسین" and "محمدحسین" all index to the same text.
+_CHAR_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و",
+    "\u200c": None, "\u200d": None, "\u200e": None, "\u200f": None, "\u0640": None,
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(raw: str) -> str:
+    """Search key: NFKD without combining marks (harakat, madda), unified Persian letters, casefolded, no spaces."""
+    if not raw:
+        return ""
+    if raw.isascii():
+        return _SPACE_RE.sub("", raw.lower())
+    text = unicodedata.normalize("NFKD", raw)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = unicodedata.normalize("NFC", text).translate(_CHAR_MAP).casefold()
+    return _SPACE_RE.sub("", text)
+
+
+def trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Trigram index over lead name, username and email for admin lookups.
+    Postings are int32 arrays of document ids; re-indexing an email tombstones its old document.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []          # doc id -> email
+        self._texts = []         # doc id -> normalized "name\0username\0email"
+        self._doc_of = {}        # email -> live doc id
+        self._postings = {}
+        self._pending = None     # leads added while build() runs
+        self.built = False
+
+    def build(self, leads):
+        """Index an iterable of leads (a LeadStore snapshot); meant to run in a worker thread."""
+        with self._lock:
+            if self.built or self._pending is not None:
+                return
+            self._pending = []
+        batch = []
+        for lead in leads:
+            batch.append(lead)
+            if len(batch) == 1000:
+                with self._lock:
+                    for item in batch:
+                        self._add(item)
+                batch.clear()
+        with self._lock:
+            for item in batch:
+                self._add(item)
+        with self._lock:
+            for lead in self._pending:
+                self._add(lead)
+            self._pending = None
+            self.built = True
+
+    def add(self, lead):
+        with self._lock:
+            if self.built:
+                self._add(lead)
+            elif self._pending is not None:
+                self._pending.append(lead)
+
+    def _add(self, lead):
+        text = "\0".join(normalize_text(v) for v in (lead.name, lead.username, lead.email))
+        old = self._doc_of.get(lead.email)
+        if old is not None:
+            if self._texts[old] == text:
+                return
+            self._texts[old] = None  # tombstone
+        doc = len(self._keys)
+        self._keys.append(lead.email)
+        self._texts.append(text)
+        self._doc_of[lead.email] = doc
+        postings = self._postings
+        for gram in trigrams(text):
+            p = postings.get(gram)
+            if p is None:
+                p = postings[gram] = array("i")
+            p.append(doc)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """Emails of matching leads, newest first: substring matches, else fuzzy trigram matches."""
+        q = normalize_text(query)
+        if len(q) < MIN_QUERY:
+            return []
+        grams = trigrams(q)
+        with self._lock:
+            lists = sorted((self._postings.get(g, ()) for g in grams), key=len)
+            texts = self._texts
+            hits = []
+            if lists[0]:
+                for doc in reversed(lists[0]):
+                    text = texts[doc]
+                    if text is not None and q in text:
+                        hits.append(doc)
+                        if len(hits) >= limit:
+                            break
+            if not hits:
+                hits = self._fuzzy(grams, lists, limit)
+            return [self._keys[doc] for doc in hits]
+
+    def _fuzzy(self, grams, lists, limit):
+        counts = {}
+        for p in lists:
+            for doc in p[-FUZZY_SCAN:]:
+                counts[doc] = counts.get(doc, 0) + 1
+        need = max(1, int(len(grams) * FUZZY_MIN_SCORE + 0.999))
+        ranked = sorted(
+            (doc for doc, n in counts.items() if n >= need and self._texts[doc] is not None),
+            key=lambda doc: (-counts[doc], -doc),
+        )
+        return ranked[:limit]
+
+    def __len__(self):
+        return len(self._doc_of)
@@ -0,0 +1,80 @@
+# sessions.py
+import os
+import sys
+import time
+import threading
+
+CONVERSATION_TIMEOUT = int(os.getenv("CONVERSATION_TIMEOUT", "900"))   # abandon registration after (s)
+CONVERSATION_NUDGE = os.getenv("CONVERSATION_NUDGE", "1") == "1"       # message the user on timeout
+USER_DATA_TTL = int(os.getenv("USER_DATA_TTL", "86400"))               # drop user/chat data idle this long (s)
+SWEEP_INTERVAL = int(os.getenv("SWEEP_INTERVAL", "300"))
+
+
+def _deep_size(obj, seen=None) -> int:
+    """Rough recursive sys.getsizeof for the small dicts kept in user_data/chat_data."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    return size
+
+
+class SessionTracker:
+    """
+    Remembers when each user/chat was last seen and which users are mid-registration,
+    so a periodic sweep can evict stale user_data/chat_data from the Application.
+    """
+
+    def __init__(self, ttl: int = USER_DATA_TTL):
+        self.ttl = ttl
+        self._users = {}
+        self._chats = {}
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def touch(self, user_id, chat_id):
+        now = time.monotonic()
+        with self._lock:
+            if user_id is not None:
+                self._users[user_id] = now
+            if chat_id is not None:
+                self._chats[chat_id] = now
+
+    def conversation_started(self, user_id):
+        with self._lock:
+            self._active.add(user_id)
+
+    def conversation_ended(self, user_id):
+        with self._lock:
+            self._active.discard(user_id)
+
+    @property
+    def live_conversations(self) -> int:
+        return len(self._active)
+
+    def sweep(self, application) -> int:
+        """Drop user_data/chat_data not touched for `ttl` seconds. Returns the number of entries evicted."""
+        cutoff = time.monotonic() - self.ttl
+        evicted = 0
+        with self._lock:
+            for uid in list(application.user_data):
+                if uid not in self._active and self._users.get(uid, 0) < cutoff:
+                    application.drop_user_data(uid)
+                    evicted += 1
+            for cid in list(application.chat_data):
+                if self._chats.get(cid, 0) < cutoff:
+                    application.drop_chat_data(cid)
+                    evicted += 1
+            for table in (self._users, self._chats):
+                for key in [k for k, ts in table.items() if ts < cutoff]:
+                    del table[key]
+        return evicted
+
+    def memory_bytes(self, application) -> int:
+        return _deep_size(dict(application.user_data)) + _deep_size(dict(application.chat_data))
@@ -0,0 +1,149 @@
+# sheet.py
+import os
+import time
+import threading
+from collections import deque
+
+import requests
+
+import metrics
+from applog import get_logger
+from resilience import dependency, CircuitOpen
+
+GOOGLE_SHEET_WEBAPP_URL = os.getenv("GOOGLE_SHEET_WEBAPP_URL")
+# Rows per POST. 1 posts one object per row, the contract of the original Apps Script; more
+# than 1 posts JSON arrays and needs the array-aware script from the README.
+SHEET_BATCH_SIZE = int(os.getenv("SHEET_BATCH_SIZE", "1"))
+SHEET_QUEUE_SIZE = int(os.getenv("SHEET_QUEUE_SIZE", "50000"))         # rows waiting for delivery
+SHEET_FLUSH_INTERVAL = float(os.getenv("SHEET_FLUSH_INTERVAL", "2"))   # wait this long to fill a batch (s)
+SHEET_MAX_ATTEMPTS = int(os.getenv("SHEET_MAX_ATTEMPTS", "5"))
+
+log = get_logger("sheet")
+
+
+# Single rows and batches have different latency profiles, so they adapt their timeouts separately.
+SHEETS = dependency("sheets", max_timeout=10)
+SHEETS_BATCH = dependency("sheets_batch", max_timeout=30)
+
+
+def post_to_sheet(payload, timeout: int = 10, url: str = None) -> bool:
+    url = url or GOOGLE_SHEET_WEBAPP_URL
+    if not url:
+        log.warning("⚠️ GOOGLE_SHEET_WEBAPP_URL not set")
+        return False
+    dep = SHEETS_BATCH if isinstance(payload, list) else SHEETS
+    try:
+        with dep.guard(cap=timeout) as call_timeout:
+            r = requests.post(url, json=payload, timeout=call_timeout)
+            if r.status_code >= 500:
+                r.raise_for_status()  # Apps Script itself failing: counts against the breaker
+        if r.status_code == 200 and isinstance(payload, list) and not _acknowledged(r, len(payload)):
+            # The original script answers 200 to an array it cannot read, so don't count those rows.
+            log.error("❌ Sheet web app did not acknowledge a batch of %s rows: deploy the array-aware "
+                      "script or set SHEET_BATCH_SIZE=1", len(payload), extra={"dependency": dep.name})
+            return False
+        if r.status_code == 200:
+            log.info("📤 POST Sheet → 200")
+            return True
+        log.warning("📤 POST Sheet → %s: %s", r.status_code, r.text[:200])
+        return False
+    except CircuitOpen:
+        log.warning("⚡ Sheet breaker open, not posting", extra={"dependency": dep.name})
+        return False
+    except Exception as e:
+        log.error("❌ post_to_sheet error: %s", e, extra={"dependency": dep.name})
+        return False
+
+
+def _acknowledged(r, rows: int) -> bool:
+    """The array-aware script answers {"rows": <rows upserted>}."""
+    try:
+        return r.json().get("rows") == rows
+    except ValueError:
+        return False
+
+
+def post_batch_to_sheet(payloads, timeout: int = 30, url: str = None, batch_size: int = SHEET_BATCH_SIZE) -> int:
+    """
+    POST rows as JSON arrays of up to `batch_size` (the web app upserts each row by email), or one
+    object per POST when `batch_size` is 1. Returns rows accepted.
+    """
+    payloads = list(payloads)
+    if batch_size <= 1:
+        return sum(1 for payload in payloads if post_to_sheet(payload, url=url))
+    accepted = 0
+    for start in range(0, len(payloads), batch_size):
+        chunk = payloads[start:start + batch_size]
+        if post_to_sheet(chunk, timeout=timeout, url=url):
+            accepted += len(chunk)
+    return accepted
+
+
+class SheetBatcher:
+    """
+    Background delivery of rows to the Sheet, in batched POSTs when SHEET_BATCH_SIZE > 1.
+
+    The queue is bounded: producers check `has_room()` (or get False from `offer()`) and push
+    back on their callers instead of growing memory while the Sheet is slow or down. A failing
+    batch is retried with backoff up to SHEET_MAX_ATTEMPTS times, then dropped (the lead store
+    still has the rows).
+    """
+
+    def __init__(self, url: str = None, capacity: int = SHEET_QUEUE_SIZE,
+                 batch_size: int = SHEET_BATCH_SIZE, interval: float = SHEET_FLUSH_INTERVAL):
+        self.url = url
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self._rows = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def has_room(self, n: int) -> bool:
+        return len(self._rows) + n <= self.capacity
+
+    def offer(self, rows) -> bool:
+        rows = list(rows)
+        if not rows or not (self.url or GOOGLE_SHEET_WEBAPP_URL):
+            return True
+        with self._cond:
+            if not self.has_room(len(rows)):
+                metrics.incr("sheet_queue_full")
+                return False
+            self._rows.extend(rows)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sheet-batcher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        metrics.set_gauge("sheet_queue", len(self._rows))
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._rows:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.interval
+                while len(self._rows) < self.batch_size and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())  # let a batch fill up
+                chunk = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            metrics.set_gauge("sheet_queue", len(self._rows))
+            self._deliver(chunk)
+
+    def _deliver(self, chunk):
+        payload, dep = (chunk, SHEETS_BATCH) if self.batch_size > 1 else (chunk[0], SHEETS)
+        for attempt in range(1, SHEET_MAX_ATTEMPTS + 1):
+            # While the breaker is open, wait it out instead of burning attempts; the queue
+            # filling up meanwhile is what pushes back on producers.
+            while dep.retry_in() > 0:
+                time.sleep(dep.retry_in())
+            if post_to_sheet(payload, timeout=30 if dep is SHEETS_BATCH else 10, url=self.url):
+                metrics.incr("sheet_rows_posted", len(chunk))
+                return
+            time.sleep(min(60, 2 ** attempt))
+        log.error("❌ Dropped %s Sheet rows after %s attempts", len(chunk), SHEET_MAX_ATTEMPTS)
+        metrics.incr("sheet_rows_failed", len(chunk))
+
+    @property
+    def pending(self) -> int:
+        return len(self._rows)
@@ -0,0 +1,184 @@
+# tenants.py
+import os
+import json
+import time
+import asyncio
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+import metrics
+from applog import get_logger
+
+TENANTS_FILE = os.getenv("TENANTS_FILE", "")                     # JSON list of tenant configs
+LEADS_DIR = os.getenv("LEADS_DIR", "tenants")                    # one leads file per extra tenant
+TENANT_IDLE_TTL = int(os.getenv("TENANT_IDLE_TTL", "1800"))      # unload bots idle this long (s)
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "256"))     # shared Bot API connection pool
+
+log = get_logger("tenants")
+
+
+class TenantConfig:
+    """One bot: its token, Sheet endpoint, admin chats and optional menu texts."""
+
+    __slots__ = ("id", "token", "sheet_url", "admin_chat_ids", "welcome_text", "about_text",
+                 "appointment_url", "leads_file")
+
+    def __init__(self, id, token, sheet_url=None, admin_chat_ids=(), welcome_text=None,
+                 about_text=None, appointment_url=None, leads_file=None):
+        self.id = id
+        self.token = token
+        self.sheet_url = sheet_url
+        self.admin_chat_ids = [int(x) for x in admin_chat_ids]
+        self.welcome_text = welcome_text
+        self.about_text = about_text
+        self.appointment_url = appointment_url
+        self.leads_file = leads_file or os.path.join(LEADS_DIR, f"{id}.jsonl")
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TenantConfig":
+        return cls(**{k: v for k, v in d.items() if k in cls.__slots__})
+
+
+class Tenant:
+    """A loaded tenant: its Application plus the lead store, search index and archive it owns."""
+
+    __slots__ = ("config", "application", "store", "search_index", "archive", "last_used", "started")
+
+    def __init__(self, config, application, store, search_index, archive=None):
+        self.config = config
+        self.application = application
+        self.store = store
+        self.search_index = search_index
+        self.archive = archive
+        self.last_used = time.monotonic()
+        self.started = False
+
+
+class SharedHTTPXRequest(HTTPXRequest):
+    """Connection pool shared by every tenant's Bot; a tenant unloading must not close it."""
+
+    async def shutdown(self):
+        pass
+
+    async def close(self):
+        await super().shutdown()
+
+
+class TenantRegistry:
+    """
+    Maps bot tokens to tenants. Applications are built by `factory(config, request)` on first use,
+    share one connection pool and event loop, and are unloaded again after `idle_ttl` seconds
+    without updates (pinned tenants stay loaded).
+    """
+
+    def __init__(self, factory, idle_ttl: int = TENANT_IDLE_TTL):
+        self.factory = factory
+        self.idle_ttl = idle_ttl
+        self.request = SharedHTTPXRequest(connection_pool_size=TENANT_POOL_SIZE)
+        self._configs = {}
+        self._tenants = {}
+        self._pinned = set()
+        self._lock = asyncio.Lock()
+
+    def register(self, config: TenantConfig, pinned: bool = False):
+        self._configs[config.token] = config
+        if pinned:
+            self._pinned.add(config.token)
+
+    def pin(self, token: str):
+        """Never unload `token` (e.g. in polling mode, where its poll loop owns the Application)."""
+        self._pinned.add(token)
+
+    def load_file(self, path: str = TENANTS_FILE):
+        if not path or not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for d in json.load(f):
+                self.register(TenantConfig.from_dict(d))
+        log.info("🏢 Loaded %s tenant configs from %s", len(self._configs), path)
+
+    def config(self, token: str) -> TenantConfig:
+        return self._configs[token]
+
+    def build(self, token: str) -> Tenant:
+        """Build (without initializing) the tenant for `token`; synchronous, no network I/O."""
+        tenant = self._tenants.get(token)
+        if tenant is None:
+            tenant = self._tenants[token] = self.factory(self._configs[token], self.request)
+            metrics.incr("tenant_loads")
+        return tenant
+
+    async def get(self, token: str):
+        """The started tenant for `token`, or None if the token is unknown."""
+        if token not in self._configs:
+            return None
+        tenant = self._tenants.get(token)
+        if tenant is None or not tenant.started:
+            async with self._lock:
+                tenant = self.build(token)
+                if not tenant.started:
+                    await tenant.application.initialize()
+                    await tenant.application.start()
+                    tenant.started = True
+        tenant.last_used = time.monotonic()
+        return tenant
+
+    async def get_by_id(self, tenant_id: str):
+        for token, config in self._configs.items():
+            if config.id == tenant_id:
+                return await self.get(token)
+        return None
+
+    async def unload(self, token: str):
+        tenant = self._tenants.pop(token, None)
+        if tenant is None:
+            return
+        if tenant.started:
+            await tenant.application.stop()
+            await tenant.application.shutdown()
+        metrics.incr("tenant_unloads")
+        log.info("💤 Unloaded idle tenant %s", tenant.config.id)
+
+    async def reap(self) -> int:
+        reaped = 0
+        async with self._lock:
+            cutoff = time.monotonic() - self.idle_ttl
+            for token in [t for t in self._tenants if t not in self._pinned]:
+                # Checked right before each unload: get() refreshes last_used without the lock,
+                # including while an earlier tenant's unload is being awaited.
+                tenant = self._tenants.get(token)
+                if tenant is None or tenant.last_used >= cutoff:
+                    continue
+                await self.unload(token)
+                reaped += 1
+        metrics.set_gauge("tenants_loaded", len(self._tenants))
+        metrics.set_gauge("tenants_configured", len(self._configs))
+        return reaped
+
+    async def set_webhooks(self, root_url: str, allowed_updates=None):
+        for token, config in self._configs.items():
+            bot = Bot(token, request=self.request)
+            await bot.initialize()
+            await bot.set_webhook(f"{root_url.rstrip('/')}/{token}", allowed_updates=allowed_updates)
+            log.info("✅ Webhook set for tenant %s", config.id)
+
+    async def delete_webhooks(self):
+        for token, config in self._configs.items():
+            bot = Bot(token, request=self.request)
+            await bot.initialize()
+            await bot.delete_webhook(drop_pending_updates=False)
+            log.info("✅ Webhook deleted for tenant %s", config.id)
+
+    async def close(self):
+        for token in list(self._tenants):
+            await self.unload(token)
+        await self.request.close()
+
+    def tokens(self):
+        return list(self._configs)
+
+    def __contains__(self, token):
+        return token in self._configs
+
+    def __len__(self):
+        return len(self._tenants)
@@ -0,0 +1,208 @@
+# tests/test_reverify.py
+# reverify.py against a local SMTP stub and a fake IMAP inbox (no network, no real mailbox).
+#   python -m pytest tests
+import os
+import sys
+import json
+import socket
+import smtplib
+import threading
+import socketserver
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import reverify  # noqa: E402
+from leads import Lead, LeadStatus, LeadStore  # noqa: E402
+from resilience import Dependency  # noqa: E402
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """
+    Minimal SMTP server. Recipients decide the answer:
+    nobody@ -> 550 at RCPT, flaky@ -> 451 at RCPT, spam@ -> 554 after DATA, anything else is accepted.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, auth_ok=True):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.auth_ok = auth_ok
+        self.delivered = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        self.reply("220 stub")
+        rcpt, in_data = None, False
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if in_data:
+                if line == ".":
+                    in_data = False
+                    if "spam@" in rcpt:
+                        self.reply("554 5.7.1 message rejected")
+                    else:
+                        self.server.delivered.append(rcpt)
+                        self.reply("250 ok")
+                continue
+            verb = line.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                self.reply("235 ok" if self.server.auth_ok else "535 5.7.8 bad credentials")
+            elif verb == "RCPT":
+                rcpt = line.split(":", 1)[1].strip("<> ")
+                if rcpt.startswith("nobody@"):
+                    self.reply("550 5.1.1 no such user")
+                elif rcpt.startswith("flaky@"):
+                    self.reply("451 4.3.0 try later")
+                else:
+                    self.reply("250 ok")
+            elif verb == "DATA":
+                in_data = True
+                self.reply("354 go ahead")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+BOUNCE = (b"From: mailer-daemon@googlemail.com\r\nSubject: Delivery Status Notification\r\n\r\n"
+          b"Address not found: your message to gone@example.com wasn't delivered (5.1.1).\r\n")
+REPLY = b"From: someone@example.com\r\nSubject: re\r\n\r\nthanks, ok@example.com\r\n"
+
+
+class FakeIMAP:
+    """Inbox holding one bounce for gone@example.com and one unrelated message."""
+
+    searches = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sock = socket.socket()
+
+    def login(self, user, password):
+        return "OK", [b""]
+
+    def select(self, mailbox, readonly=False):
+        return "OK", [b"2"]
+
+    def search(self, charset, query):
+        FakeIMAP.searches.append(query)
+        return "OK", [b"1 2"]
+
+    def fetch(self, ids, parts):
+        return "OK", [(b"1 (BODY[] {1}", BOUNCE), b")", (b"2 (BODY[] {1}", REPLY), b")"]
+
+    def logout(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """Point reverify at a fresh SMTP stub and the fake inbox; returns (stub, leads path, checkpoint path, sheet rows)."""
+    stub = SMTPStub()
+    monkeypatch.setattr(reverify, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(reverify, "SMTP_PORT", stub.port)
+    monkeypatch.setattr(reverify, "SMTP_SSL", False)
+    monkeypatch.setattr(reverify, "SMTP_EMAIL", "bot@example.com")
+    monkeypatch.setattr(reverify, "SMTP_PASSWORD", "secret")
+    monkeypatch.setattr(reverify, "IMAP_SSL", False)
+    monkeypatch.setattr(reverify.imaplib, "IMAP4", FakeIMAP)
+    # Fresh breakers, so one test's failures can't short-circuit the next.
+    monkeypatch.setattr(reverify, "SMTP", Dependency("smtp_test", 30))
+    monkeypatch.setattr(reverify, "IMAP", Dependency("imap_test", 60))
+    posted = []
+    monkeypatch.setattr(reverify, "post_batch_to_sheet", lambda rows, url=None: posted.extend(rows) or len(rows))
+    yield stub, str(tmp_path / "leads.jsonl"), str(tmp_path / "reverify.checkpoint.jsonl"), posted
+    stub.shutdown()
+    stub.server_close()
+
+
+def _seed(path, leads):
+    store = LeadStore(path)
+    store.extend(Lead(email.split("@")[0], email, status=status) for email, status in leads)
+
+
+def _statuses(path):
+    return {lead.email: lead.status for lead in LeadStore(path).load()}
+
+
+def test_send_refuse_bounce(env):
+    stub, path, checkpoint, posted = env
+    _seed(path, [
+        ("ok@example.com", LeadStatus.PENDING),
+        ("gone@example.com", LeadStatus.VALIDATED),    # accepted, then bounces
+        ("nobody@example.com", LeadStatus.PENDING),    # 550 at RCPT
+        ("spam@example.com", LeadStatus.PENDING),      # 554 after DATA
+        ("flaky@example.com", LeadStatus.PENDING),     # 451: deferred to the next run
+        ("not-an-email", LeadStatus.PENDING),          # fails the pre-screen, never sent
+        ("done@example.com", LeadStatus.VERIFIED),     # not a candidate
+    ])
+
+    summary = reverify.reverify(LeadStore(path).load(), reverify.Checkpoint(checkpoint), workers=2, wait=0,
+                                check_dns=False)
+
+    assert summary == {"verified": 1, "invalid": 4, "deferred": 1, "sheet_rows": 5}
+    assert sorted(stub.delivered) == ["gone@example.com", "ok@example.com"]
+    assert _statuses(path) == {
+        "ok@example.com": LeadStatus.VERIFIED,
+        "gone@example.com": LeadStatus.INVALID,
+        "nobody@example.com": LeadStatus.INVALID,
+        "spam@example.com": LeadStatus.INVALID,
+        "flaky@example.com": LeadStatus.PENDING,
+        "not-an-email": LeadStatus.INVALID,
+        "done@example.com": LeadStatus.VERIFIED,
+    }
+    assert {row["email"] for row in posted} == {"ok@example.com", "gone@example.com", "nobody@example.com",
+                                                "spam@example.com", "not-an-email"}
+    assert not os.path.exists(checkpoint)
+
+
+def test_resume_skips_recorded_outcomes(env):
+    stub, path, checkpoint, _ = env
+    _seed(path, [
+        ("ok@example.com", LeadStatus.PENDING),
+        ("gone@example.com", LeadStatus.PENDING),
+        ("two@example.com", LeadStatus.PENDING),
+    ])
+    # An interrupted run that had already mailed two leads.
+    with open(checkpoint, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"since": 1_700_000_000}) + "\n")
+        f.write(json.dumps({"email": "ok@example.com", "result": reverify.SENT}) + "\n")
+        f.write(json.dumps({"email": "gone@example.com", "result": reverify.SENT}) + "\n")
+    FakeIMAP.searches.clear()
+
+    summary = reverify.reverify(LeadStore(path).load(), reverify.Checkpoint(checkpoint), workers=2, wait=0,
+                                check_dns=False)
+
+    assert stub.delivered == ["two@example.com"]
+    assert summary["verified"] == 2 and summary["invalid"] == 1
+    assert _statuses(path)["gone@example.com"] == LeadStatus.INVALID
+    # The bounce search covers the interrupted run too, not just this one.
+    assert FakeIMAP.searches == ['(FROM "mailer-daemon" SINCE "14-Nov-2023")']
+
+
+def test_auth_failure_aborts_without_marking_leads(env, monkeypatch):
+    stub, path, checkpoint, posted = env
+    stub.auth_ok = False
+    _seed(path, [("ok@example.com", LeadStatus.PENDING), ("two@example.com", LeadStatus.VALIDATED)])
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        reverify.reverify(LeadStore(path).load(), reverify.Checkpoint(checkpoint), workers=1, wait=0,
+                          check_dns=False)
+
+    assert _statuses(path) == {"ok@example.com": LeadStatus.PENDING, "two@example.com": LeadStatus.VALIDATED}
+    assert posted == []
+    assert os.path.exists(checkpoint)  # a rerun with fixed credentials resumes from here
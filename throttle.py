@@ -0,0 +1,82 @@
+# throttle.py
+import os
+import time
+import threading
+from collections import deque
+
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "1.0"))          # tokens refilled per second
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "5"))          # bucket size
+THROTTLE_IDLE_TTL = int(os.getenv("THROTTLE_IDLE_TTL", "600"))    # evict buckets idle this long (s)
+MAX_REGISTRATIONS_PER_HOUR = int(os.getenv("MAX_REGISTRATIONS_PER_HOUR", "3"))
+
+
+class _Bucket:
+    __slots__ = ("tokens", "ts")
+
+    def __init__(self, tokens: float, ts: float):
+        self.tokens = tokens
+        self.ts = ts
+
+
+class Throttle:
+    """
+    Per-user token bucket plus an hourly registration cap.
+    Buckets are tiny slot objects and are evicted once idle for `idle_ttl` seconds.
+    """
+
+    def __init__(self, rate=THROTTLE_RATE, burst=THROTTLE_BURST,
+                 idle_ttl=THROTTLE_IDLE_TTL, max_registrations=MAX_REGISTRATIONS_PER_HOUR):
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = idle_ttl
+        self.max_registrations = max_registrations
+        self._buckets = {}
+        self._registrations = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + idle_ttl
+
+    def allow(self, user_id, cost: float = 1) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            b = self._buckets.get(user_id)
+            if b is None:
+                if cost > self.burst:
+                    return False
+                self._buckets[user_id] = _Bucket(self.burst - cost, now)
+                return True
+            b.tokens = min(self.burst, b.tokens + (now - b.ts) * self.rate)
+            b.ts = now
+            if b.tokens < cost:
+                return False
+            b.tokens -= cost
+            return True
+
+    def allow_registration(self, user_id: int) -> bool:
+        """Record a registration attempt; False once the hourly cap is reached."""
+        if self.max_registrations <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            hits = self._registrations.get(user_id)
+            if hits is None:
+                hits = self._registrations[user_id] = deque(maxlen=self.max_registrations)
+            while hits and now - hits[0] >= 3600:
+                hits.popleft()
+            if len(hits) >= self.max_registrations:
+                return False
+            hits.append(now)
+            return True
+
+    def _sweep(self, now: float):
+        idle = [uid for uid, b in self._buckets.items() if now - b.ts >= self.idle_ttl]
+        for uid in idle:
+            del self._buckets[uid]
+        stale = [uid for uid, h in self._registrations.items() if not h or now - h[-1] >= 3600]
+        for uid in stale:
+            del self._registrations[uid]
+        self._next_sweep = now + self.idle_ttl
+
+    def __len__(self):
+        return len(self._buckets)